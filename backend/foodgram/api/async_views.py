@@ -0,0 +1,192 @@
+"""Асинхронные маршруты горячих путей чтения для ASGI.
+
+Под ASGI-сервером (ASYNC_READ_VIEWS) список и карточку рецепта, теги,
+ингредиенты и выгрузку списка покупок обслуживают корутины. Они сами
+отвечают тем, что собирается из кешей и справочников в памяти: 304 по
+валидаторам, готовая страница списка, представление рецепта, теги,
+автодополнение ингредиентов, файл списка покупок через асинхронный ORM.
+Всё остальное — промахи кешей, фильтры по данным пользователя, ошибки,
+запись — передаётся синхронному DRF-представлению того же маршрута,
+поэтому ответ строится одними и теми же функциями. Пока корутина ждёт
+кеш или базу, воркер обслуживает другие соединения.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.urls import URLPattern
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+
+from recipes import shopping_list
+from recipes.autocomplete import ingredient_index, search_index
+from recipes.memberships import amemberships
+from recipes.reference import tag_cache
+
+from .authentication import CachedTokenAuthentication
+from .conditional import (auser_versions, detail_row, precondition,
+                          recipe_detail_parts, recipe_list_parts,
+                          reference_parts, set_validators)
+from .fragments import fragment_keys
+from .list_cache import (USER_PARAMS, ageneration, cache_key, get_cache,
+                         overlay)
+from .serializers import TagSerializer
+from .views import file_response
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def json_response(data):
+    return HttpResponse(
+        JSONRenderer().render(data), content_type='application/json')
+
+
+async def authenticate(request):
+    """Ставит request.user; False — заголовок проверит DRF."""
+    try:
+        result = await CachedTokenAuthentication().aauthenticate(request)
+    except AuthenticationFailed:
+        return False
+    request.user = result[0] if result else AnonymousUser()
+    return True
+
+
+async def add_user_flags(recipes, request):
+    if request.user.is_authenticated:
+        request._memberships = await amemberships(request.user.id)
+        overlay(recipes, request)
+    return recipes
+
+
+def reference_route(reference, list_data, item_data):
+    async def fast_path(request, pk=None):
+        state = await reference.astate()
+        headers, response = precondition(
+            request, reference_parts(reference, state[0], request))
+        if response is None:
+            if pk is None:
+                data = list_data(state, request)
+            else:
+                data = pk.isdigit() and item_data(state, int(pk))
+                if not data:
+                    return None
+            response = json_response(data)
+        return set_validators(response, headers)
+    return fast_path
+
+
+tags = reference_route(
+    tag_cache,
+    lambda state, request: TagSerializer(state[1], many=True).data,
+    lambda state, pk: pk in state[2] and TagSerializer(state[2][pk]).data,
+)
+
+
+def ingredient_rows(state, request):
+    name = request.GET.get('name')
+    if name is None:
+        return state[3][1]
+    return search_index(state[3], name)
+
+
+ingredients = reference_route(
+    ingredient_index, ingredient_rows,
+    lambda state, pk: state[3][2].get(pk),
+)
+
+
+async def recipe_list(request):
+    if 'format' in request.GET or request.user.is_authenticated and any(
+            name in request.GET for name in USER_PARAMS):
+        return None
+    versions = await ageneration()
+    headers, response = precondition(request, recipe_list_parts(
+        request, versions, await auser_versions(request)))
+    if response is None:
+        entry = await get_cache().aget(cache_key(request))
+        if entry is None or entry[0] != versions:
+            return None
+        if request.user.is_anonymous:
+            response = HttpResponse(
+                entry[1], content_type='application/json')
+        else:
+            data = json.loads(entry[1])
+            await add_user_flags(data['results'], request)
+            response = json_response(data)
+    return set_validators(response, headers)
+
+
+async def recipe_detail(request, pk):
+    if request.GET or not pk.isdigit():
+        return None
+    row = await detail_row(pk).afirst()
+    if row is None:
+        return None
+    references = (
+        await tag_cache.aversion(), await ingredient_index.aversion())
+    headers, response = precondition(request, recipe_detail_parts(
+        request, pk, row, references, await auser_versions(request)))
+    if response is None:
+        version = {'id': int(pk), 'updated_at': row[0],
+                   'author__updated_at': row[1]}
+        key = fragment_keys((version,), request, None, references)[int(pk)]
+        recipe = await get_cache().aget(key)
+        if recipe is None:
+            return None
+        await add_user_flags([recipe], request)
+        response = json_response(recipe)
+    return set_validators(response, headers)
+
+
+async def download_shopping_cart(request):
+    file_format = request.GET.get('format', 'txt')
+    if (request.user.is_anonymous
+            or file_format not in shopping_list.RENDERERS):
+        return None
+    try:
+        content = await shopping_list.aexport(request.user, file_format)
+    except shopping_list.ExportBusy:
+        return None
+    return file_response(
+        content, file_format, shopping_list.achunks(content))
+
+
+FAST_PATHS = {
+    'recipes-list': recipe_list,
+    'recipes-detail': recipe_detail,
+    'recipes-download-shopping-cart': download_shopping_cart,
+    'tags-list': tags,
+    'tags-detail': tags,
+    'ingredients-list': ingredients,
+    'ingredients-detail': ingredients,
+}
+
+
+def async_route(fast_path, view):
+    """Корутина маршрута: fast_path или, если он вернул None, view."""
+    sync_view = sync_to_async(view)
+
+    async def route(request, *args, **kwargs):
+        if request.method in SAFE_METHODS and await authenticate(request):
+            response = await fast_path(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_view(request, *args, **kwargs)
+
+    # Как у DRF-представлений: CSRF проверяет аутентификация DRF.
+    route.csrf_exempt = True
+    return route
+
+
+def async_routes(patterns):
+    """Маршруты роутера, где горячие пути заменены корутинами."""
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_route(FAST_PATHS[pattern.name], pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        ) if pattern.name in FAST_PATHS else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,160 @@
+"""Аутентификация по токену без запроса к базе на каждый вызов API.
+
+Поля пользователя токена (без хеша пароля) хранятся в общем кеше и в
+небольшом LRU процесса вместе с версией аутентификации пользователя.
+Выход, смена пароля, удаление и любое сохранение пользователя меняют
+эту версию в общем кеше, и записи со старой версией отбрасываются во
+всех воркерах сразу: попадание в LRU стоит одного чтения версии.
+"""
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework import exceptions
+from rest_framework.authentication import (TokenAuthentication,
+                                           get_authorization_header)
+from rest_framework.authtoken.models import Token
+
+from recipes.routing import primary
+from recipes.versions import Version
+from users.models import CustomUser
+
+CACHE_TIMEOUT = 15 * 60
+
+
+class LRU:
+    """Потокобезопасный LRU с временем жизни записей."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        if not self.size or self.ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+token_users = LRU(settings.AUTH_TOKEN_LRU_SIZE, settings.AUTH_TOKEN_LRU_TTL)
+
+
+# Пароль не кешируется: у восстановленного пользователя он отложен.
+USER_FIELDS = tuple(
+    field.attname for field in CustomUser._meta.concrete_fields
+    if field.attname != 'password'
+)
+
+
+def cache_key(key):
+    return 'auth:token:' + sha256(key.encode()).hexdigest()
+
+
+def auth_version(user_id):
+    """Версия аутентификации пользователя."""
+    return Version(f'users:{user_id}:auth:version')
+
+
+def forget_user(user_id):
+    """Отзывает кешированные токены пользователя сейчас и после фиксации."""
+    version = auth_version(user_id)
+    version.touch()
+    transaction.on_commit(version.touch)
+
+
+def user_entry(user, version):
+    return (version, user.pk, tuple(
+        getattr(user, name) for name in USER_FIELDS))
+
+
+def restore(entry):
+    return CustomUser.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, entry[2])
+
+
+def cached_user(key):
+    """Пользователь токена из кешей, без запроса к базе, или None."""
+    name = cache_key(key)
+    entry = token_users.get(name) or cache.get(name)
+    if entry is None or entry[0] != auth_version(entry[1]).get():
+        return None
+    token_users.set(name, entry)
+    return restore(entry)
+
+
+async def acached_user(key):
+    name = cache_key(key)
+    entry = token_users.get(name) or await cache.aget(name)
+    if entry is None or entry[0] != await auth_version(entry[1]).aget():
+        return None
+    token_users.set(name, entry)
+    return restore(entry)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кешем пользователя токена."""
+
+    def authenticate_credentials(self, key):
+        user = cached_user(key)
+        if user is not None:
+            return user, Token(key=key, user=user)
+        with primary():
+            # Версия читается до проверки токена: выход, случившийся
+            # после чтения пользователя, отбросит эту запись.
+            user_id = Token.objects.filter(key=key).values_list(
+                'user_id', flat=True).first()
+            version = user_id and auth_version(user_id).get()
+            # Неизвестный токен отклоняется здесь же.
+            user, token = super().authenticate_credentials(key)
+        entry = user_entry(user, version)
+        cache.set(cache_key(key), entry, CACHE_TIMEOUT)
+        token_users.set(cache_key(key), entry)
+        return user, token
+
+    async def aauthenticate(self, request):
+        """authenticate() для асинхронных представлений.
+
+        Пользователь из кеша не требует потока для базы; при промахе
+        проверка идёт синхронным путём.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed()
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed()
+        user = await acached_user(key)
+        if user is None:
+            return await sync_to_async(self.authenticate_credentials)(key)
+        return user, Token(key=key, user=user)
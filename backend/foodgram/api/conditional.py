@@ -0,0 +1,133 @@
+"""Условные запросы: ETag, Last-Modified и ответ 304.
+
+Валидаторы собираются из версий данных до сериализации, поэтому
+неизменившийся ответ стоит одного обращения к кешу (список) или одного
+лёгкого запроса (рецепт). Флаги текущего пользователя входят в
+валидатор через версию его избранного, покупок и подписок.
+"""
+from functools import wraps
+from hashlib import md5
+
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers, quote_etag)
+from django.utils.http import http_date
+
+from recipes.autocomplete import ingredient_index
+from recipes.models import Recipe
+from recipes.reference import tag_cache
+from recipes.versions import recipes_version, user_flags_version
+
+
+def precondition(request, validators):
+    """Заголовки валидаторов и готовый ответ 304/412, если он есть."""
+    parts, modified = validators
+    etag = quote_etag(md5(repr(parts).encode()).hexdigest())
+    last_modified = int(modified)
+    return (etag, last_modified), get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, headers):
+    if response.status_code in (200, 304):
+        etag, last_modified = headers
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def conditional(get_validators):
+    """Отдаёт 304, если валидаторы совпали с заголовками запроса.
+
+    get_validators(view, request, *args, **kwargs) возвращает пару
+    (части ETag, метка времени изменения) или None, если ресурса нет.
+    Метод может отдать данные другой версии и указать их валидаторы
+    в атрибуте validators ответа.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            validators = get_validators(self, request, *args, **kwargs)
+            if validators is None:
+                return method(self, request, *args, **kwargs)
+            headers, response = precondition(request, validators)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+                own = getattr(response, 'validators', None)
+                if own is not None:
+                    headers, not_modified = precondition(request, own)
+                    response = not_modified or response
+            return set_validators(response, headers)
+        return wrapper
+    return decorator
+
+
+def user_versions(request):
+    if request.user.is_anonymous:
+        return (None, 0)
+    version = user_flags_version(request.user.id).get()
+    return (request.user.id, version)
+
+
+async def auser_versions(request):
+    if request.user.is_anonymous:
+        return (None, 0)
+    version = await user_flags_version(request.user.id).aget()
+    return (request.user.id, version)
+
+
+def reference_parts(reference, version, request):
+    return (reference.version_key, version, request.get_full_path()), version
+
+
+def reference_validators(reference):
+    def get_validators(view, request, *args, **kwargs):
+        return reference_parts(reference, reference.version(), request)
+    return get_validators
+
+
+tag_validators = reference_validators(tag_cache)
+ingredient_validators = reference_validators(ingredient_index)
+
+
+def recipe_list_parts(request, versions, user_versions):
+    user, user_version = user_versions
+    return (
+        ('recipes', request.get_full_path(), user) + versions
+        + (user_version,),
+        max(versions + (user_version,)),
+    )
+
+
+def recipe_list_validators(view, request, *args, **kwargs):
+    """Версия всей коллекции: любой записи рецептов, тегов, ингредиентов."""
+    versions = (
+        recipes_version.get(), tag_cache.version(), ingredient_index.version(),
+    )
+    return recipe_list_parts(request, versions, user_versions(request))
+
+
+def recipe_detail_parts(request, pk, row, references, user_versions):
+    if row is None:
+        return None
+    versions = (row[0].timestamp(), row[1].timestamp()) + references
+    user, user_version = user_versions
+    return (
+        ('recipe', pk, user) + versions + (user_version,),
+        max(versions + (user_version,)),
+    )
+
+
+def detail_row(pk):
+    """Запрос updated_at рецепта и автора: первый валидатор карточки."""
+    return Recipe.objects.filter(pk=pk).values_list(
+        'updated_at', 'author__updated_at')
+
+
+def recipe_detail_validators(view, request, pk=None, **kwargs):
+    """Версия одного рецепта по его updated_at и updated_at автора."""
+    row = detail_row(pk).first() if pk.isdigit() else None
+    references = (tag_cache.version(), ingredient_index.version())
+    return recipe_detail_parts(
+        request, pk, row, references, user_versions(request))
@@ -0,0 +1,57 @@
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from recipes.images import variant_name
+
+
+class ReferencePrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """Первичный ключ справочника, проверяемый по кешу в памяти."""
+
+    def __init__(self, reference, **kwargs):
+        self.reference = reference
+        if not kwargs.get('read_only'):
+            kwargs.setdefault('queryset', reference.model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not str(data).isdigit():
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.reference.get(int(data))
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+def file_url(name, request=None):
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+class ImageVariantField(serializers.Field):
+    """Ссылка на вариант фото рецепта, а пока его нет — на оригинал.
+
+    Без variant берётся вариант из контекста (image_variant).
+    """
+
+    def __init__(self, variant=None, **kwargs):
+        self.variant = variant
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        name = variant_name(
+            recipe, self.variant or self.context.get('image_variant'))
+        if not name:
+            return None
+        return file_url(name, self.context.get('request'))
+
+
+class UploadOrBase64ImageField(Base64ImageField):
+    """Фото строкой base64 в JSON или файлом в multipart/form-data."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            return serializers.ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
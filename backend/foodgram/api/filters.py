@@ -1,6 +1,7 @@
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.search import search_recipes
 from users.models import CustomUser
 
 
@@ -13,32 +14,45 @@ class IngredientLookupFilter(filters.FilterSet):
 
 
 class RecipeFilter(filters.FilterSet):
-    """Фильтр рецептов по тегам, избранному, списку покупок."""
+    """Фильтр рецептов по тегам, избранному, списку покупок и тексту."""
     author = filters.ModelChoiceFilter(
         queryset=CustomUser.objects.all())
 
     is_favorited = filters.BooleanFilter(
-        method='is_favorited', label='favorite', field_name='is_favorite'
+        method='filter_is_favorited', label='favorite',
+        field_name='is_favorite'
     )
 
-    is_in_shopping_cart = filters.BooleanFilter(field_name='is_cart',
-                                                label='shoppings_list',
-                                                method='is_in_shopping_cart')
+    is_in_shopping_cart = filters.BooleanFilter(
+        field_name='is_cart', label='shoppings_list',
+        method='filter_is_in_shopping_cart'
+    )
 
     tags = filters.ModelMultipleChoiceFilter(field_name='tags__slug',
                                              to_field_name='slug',
                                              queryset=Tag.objects.all())
 
+    search = filters.CharFilter(method='filter_search', label='search')
+
     class Meta:
         model = Recipe
         fields = ('author', 'tags',)
 
-    def is_favorited(self, queryset, name, value):
-        if value and self.request and self.request.user.is_authenticated:
-            return queryset.filter(favorites__user=self.request.user)
-        return queryset.exclude(favorites__user=self.request.user)
+    def filter_is_favorited(self, queryset, name, value):
+        if self.request and self.request.user.is_authenticated:
+            # Подзапрос, а не список id: у пользователя их может быть много.
+            ids = Favorite.objects.filter(
+                user=self.request.user).values('recipe_id')
+            if value:
+                return queryset.filter(pk__in=ids)
+            return queryset.exclude(pk__in=ids)
+        return queryset
 
-    def is_in_shopping_cart(self, queryset, name, value):
+    def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request and self.request.user.is_authenticated:
-            return Recipe.objects.filter(cart__user=self.request.user)
+            return queryset.filter(pk__in=ShoppingCart.objects.filter(
+                user=self.request.user).values('recipe_id'))
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
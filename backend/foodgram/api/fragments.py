@@ -0,0 +1,50 @@
+"""Кеш представления отдельного рецепта.
+
+Представление рецепта одинаково для всех, кроме флагов is_favorited,
+is_in_shopping_cart и author.is_subscribed. Поэтому оно хранится без
+флагов, под ключом из updated_at рецепта и автора, версий тегов и
+ингредиентов и адреса сайта, от которого зависят ссылки на фото. Любая
+запись рецепта, справочника или профиля автора даёт новый ключ. Флаги
+пользователя проставляются поверх одним пакетом на страницу.
+"""
+from hashlib import md5
+
+from recipes.autocomplete import ingredient_index
+from recipes.reference import tag_cache
+from recipes.routing import primary
+
+from .list_cache import get_cache
+
+VERSION_FIELDS = ('id', 'updated_at', 'author__updated_at')
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def fragment_keys(rows, request, variant, references):
+    """Ключи по id; references — версии тегов и ингредиентов."""
+    shared = references + (variant, request.scheme, request.get_host())
+    return {
+        row['id']: 'recipes:fragment:{}:{}'.format(row['id'], md5(repr((
+            row['updated_at'], row['author__updated_at'], *shared,
+        )).encode()).hexdigest())
+        for row in rows
+    }
+
+
+def recipe_fragments(rows, request, build, variant=None):
+    """Представления рецептов в порядке rows без флагов пользователя.
+
+    rows — словари с полями VERSION_FIELDS, build(ids) собирает
+    недостающие представления и возвращает их по id.
+    """
+    cache = get_cache()
+    references = (tag_cache.version(), ingredient_index.version())
+    keys = fragment_keys(rows, request, variant, references)
+    found = cache.get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in found]
+    if missing:
+        with primary():
+            built = build(missing)
+        built = {keys[pk]: recipe for pk, recipe in built.items()}
+        cache.set_many(built, CACHE_TIMEOUT)
+        found.update(built)
+    return [found[keys[row['id']]] for row in rows if keys[row['id']] in found]
@@ -0,0 +1,117 @@
+"""Кеш страниц списка рецептов.
+
+Страница хранится в анонимном виде под нормализованными параметрами
+фильтра и навигации вместе с поколением данных: версиями рецептов, тегов
+и ингредиентов. Устаревшую страницу пересобирает один запрос, остальные
+в это время отдают прежнюю с валидаторами её поколения. Пользователь
+получает ту же страницу со своими флагами поверх, а не обход кеша.
+"""
+import json
+from hashlib import md5
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from recipes.autocomplete import ingredient_index
+from recipes.reference import tag_cache
+from recipes.routing import primary
+from recipes.versions import recipes_version
+
+from .conditional import recipe_list_parts, user_versions
+from .mixins import user_memberships
+
+KEY_PARAMS = (
+    'author', 'tags', 'search', 'page', 'limit', 'pagination', 'cursor',
+    'with_count',
+)
+# Фильтры по данным пользователя, их страницы не кешируются.
+USER_PARAMS = ('is_favorited', 'is_in_shopping_cart')
+CACHE_TIMEOUT = 60 * 60
+# Дольше этого устаревшую страницу не отдают, даже если пересборка упала.
+REBUILD_TIMEOUT = 10
+
+
+def get_cache():
+    return caches[settings.RECIPE_LIST_CACHE]
+
+
+def cache_key(request):
+    params = sorted(
+        (name, sorted(set(request.GET.getlist(name))))
+        for name in KEY_PARAMS if name in request.GET
+    )
+    raw = repr((request.scheme, request.get_host(), params))
+    return 'recipes:list:' + md5(raw.encode()).hexdigest()
+
+
+def generation():
+    return (
+        recipes_version.get(), tag_cache.version(), ingredient_index.version(),
+    )
+
+
+async def ageneration():
+    return (
+        await recipes_version.aget(), await tag_cache.aversion(),
+        await ingredient_index.aversion(),
+    )
+
+
+def anonymous_request(request):
+    anonymous = Request(request._request, parsers=request.parsers)
+    anonymous._user, anonymous._auth = AnonymousUser(), None
+    return anonymous
+
+
+def anonymous_response(view, request, build):
+    if request.user.is_anonymous:
+        return build(request)
+    anonymous = view.request = anonymous_request(request)
+    try:
+        return build(anonymous)
+    finally:
+        view.request = request
+
+
+def overlay(recipes, request):
+    """Проставляет флаги пользователя в анонимные рецепты."""
+    sets = user_memberships(request)
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in sets['favorites']
+        recipe['is_in_shopping_cart'] = recipe['id'] in sets['cart']
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in sets['follows'])
+    return recipes
+
+
+def cached_list(view, request, build):
+    """Страница списка из кеша; build(request) собирает её без кеша."""
+    if request.user.is_authenticated and any(
+            name in request.query_params for name in USER_PARAMS):
+        return build(request)
+    cache = get_cache()
+    key = cache_key(request)
+    current = generation()
+    entry = cache.get(key)
+    if entry is None or entry[0] != current and cache.add(
+            key + ':rebuild', True, REBUILD_TIMEOUT):
+        with primary():
+            response = anonymous_response(view, request, build)
+        if response.status_code != 200:
+            return response
+        entry = (current, JSONRenderer().render(response.data))
+        cache.set(key, entry, CACHE_TIMEOUT)
+        cache.delete(key + ':rebuild')
+    data = json.loads(entry[1])
+    if request.user.is_authenticated:
+        overlay(data['results'], request)
+    response = Response(data)
+    if entry[0] != current:
+        # Прежняя страница не должна получить ETag нового поколения.
+        response.validators = recipe_list_parts(
+            request, entry[0], user_versions(request))
+    return response
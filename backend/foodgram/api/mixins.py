@@ -1,9 +1,30 @@
-from users.models import Follow
+from recipes.memberships import IdSet, memberships
+
+
+def user_memberships(request):
+    """Избранное, корзина и подписки пользователя запроса.
+
+    Наборы берутся из общего кеша один раз на запрос; у анонимного
+    пользователя они пустые.
+    """
+    sets = getattr(request, '_memberships', None)
+    if sets is None:
+        if request.user.is_anonymous:
+            sets = {kind: IdSet() for kind in ('favorites', 'cart', 'follows')}
+        else:
+            sets = memberships(request.user.id)
+        request._memberships = sets
+    return sets
+
+
+def subscribed_ids(request):
+    """Авторы, на которых подписан пользователь запроса."""
+    return user_memberships(request)['follows']
 
 
 class FollowMixin:
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
+        request = self.context.get('request')
+        if request is None or request.user.is_anonymous:
             return False
-        return Follow.objects.filter(user=user, author=obj.id).exists()
+        return obj.id in subscribed_ids(request)
@@ -1,6 +1,84 @@
-from rest_framework.pagination import PageNumberPagination
+from hashlib import md5
+
+from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from recipes.routing import primary
+
+MAX_PAGE_SIZE = 100
+COUNT_CACHE_TIMEOUT = 60
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+    max_page_size = MAX_PAGE_SIZE
+
+
+class FeedCursorPagination(CursorPagination):
+    """Курсорная навигация по убыванию id без COUNT и OFFSET.
+
+    Общее количество отдаётся только по запросу with_count=1 и
+    кешируется для одинаковых выборок.
+    """
+
+    ordering = '-id'
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    count_query_param = 'with_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = self.get_cached_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    @staticmethod
+    def get_cached_count(queryset):
+        key = 'count:' + md5(str(queryset.query).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            with primary():
+                count = queryset.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data['count'] = self.count
+        return response
+
+
+class FeedPagination(CustomPageNumberPagination):
+    """Постраничная навигация с курсорным режимом по выбору клиента.
+
+    Курсорный режим включается параметром pagination=cursor; ссылки
+    next и previous сохраняют его вместе с непрозрачным курсором. Курсор
+    идёт по убыванию id, поэтому с поиском, который сортирует по
+    релевантности, он не сочетается и такой запрос отклоняется.
+    """
+
+    mode_query_param = 'pagination'
+    ranked_query_params = ('search',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if request.query_params.get(self.mode_query_param) == 'cursor':
+            if any(name in request.query_params
+                   for name in self.ranked_query_params):
+                raise ValidationError({self.mode_query_param: (
+                    'Курсорный режим недоступен при поиске: результаты '
+                    'поиска упорядочены по релевантности.'
+                )})
+            self.cursor_paginator = FeedCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,29 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import MultiPartParser
+
+PAYLOAD_PART = 'data'
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """multipart/form-data с полями в JSON-части data и файлами.
+
+    Файлы пишутся на диск обработчиками загрузки Django, поэтому память
+    на запрос не зависит от размера фото.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parsed = super().parse(stream, media_type, parser_context)
+        if PAYLOAD_PART not in parsed.data:
+            return parsed
+        try:
+            data = json.loads(parsed.data[PAYLOAD_PART])
+        except ValueError as error:
+            raise ParseError(f'Некорректный JSON в части {PAYLOAD_PART}: '
+                             f'{error}')
+        if not isinstance(data, dict):
+            raise ParseError(
+                f'Часть {PAYLOAD_PART} должна содержать JSON-объект.')
+        data.update(parsed.files.dict())
+        return data
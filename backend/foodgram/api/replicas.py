@@ -0,0 +1,193 @@
+"""Чтение из реплик базы данных.
+
+Безопасные запросы к спискам и карточкам рецептов, тегам, ингредиентам
+и пользователям читают из реплики (REPLICA_DATABASES), всё остальное и
+любая запись идут в основную базу. После собственной записи (рецепт,
+избранное, список покупок, подписка, профиль) пользователь на
+REPLICA_PIN_SECONDS закрепляется за основной базой и видит свои
+изменения, даже если реплика отстаёт. Токен, которого ещё нет в кеше
+аутентификации, тоже читается из основной базы: он мог только что
+появиться. Недоступная реплика пропускается, пока не пройдёт проверку
+снова, а без живых реплик чтение идёт в основную базу. Заполнение общих
+кешей всегда читает из основной базы (recipes.routing.primary).
+"""
+import random
+import time
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from rest_framework.authentication import get_authorization_header
+
+from recipes.routing import read_alias
+
+from .authentication import acached_user, cached_user
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+READ_ROUTES = {
+    'recipes-list', 'recipes-detail',
+    'tags-list', 'tags-detail',
+    'ingredients-list', 'ingredients-detail',
+    'users-list', 'users-detail', 'users-subscriptions',
+}
+
+# Результаты проверок процесса: псевдоним -> (время проверки, жива ли).
+health = {}
+
+
+def pin_key(user_id):
+    return f'replicas:pinned:{user_id}'
+
+
+def pin(user_id):
+    """Закрепляет пользователя за основной базой после фиксации."""
+    if settings.REPLICA_DATABASES and user_id is not None:
+        transaction.on_commit(lambda: cache.set(
+            pin_key(user_id), True, settings.REPLICA_PIN_SECONDS))
+
+
+def check(alias):
+    """Проверяет реплику запросом и запоминает результат."""
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        alive = True
+    except DatabaseError:
+        connections[alias].close()
+        alive = False
+    health[alias] = (time.monotonic(), alive)
+    return alive
+
+
+def due(alias):
+    checked = health.get(alias, (None,))[0]
+    return checked is None or (
+        time.monotonic() - checked >= settings.REPLICA_HEALTH_INTERVAL)
+
+
+def healthy(alias):
+    return check(alias) if due(alias) else health[alias][1]
+
+
+async def ahealthy(alias):
+    if due(alias):
+        return await sync_to_async(check)(alias)
+    return health[alias][1]
+
+
+def shuffled_replicas():
+    replicas = list(settings.REPLICA_DATABASES)
+    random.shuffle(replicas)
+    return replicas
+
+
+def choose_replica():
+    """Случайная живая реплика или None."""
+    return next(
+        (alias for alias in shuffled_replicas() if healthy(alias)), None)
+
+
+async def achoose_replica():
+    for alias in shuffled_replicas():
+        if await ahealthy(alias):
+            return alias
+    return None
+
+
+def replica_route(request):
+    return (
+        settings.REPLICA_DATABASES
+        and request.method in SAFE_METHODS
+        and request.resolver_match.url_name in READ_ROUTES
+    )
+
+
+def token_key(request):
+    """Ключ токена из заголовка, None без него и False, если он битый."""
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2:
+        return None
+    try:
+        return auth[1].decode()
+    except UnicodeError:
+        return False
+
+
+def unpinned(user):
+    return user is not None and not cache.get(pin_key(user.pk))
+
+
+def reads_replica(request):
+    """Может ли запрос читать из реплики."""
+    if not replica_route(request):
+        return False
+    key = token_key(request)
+    return key is None or bool(key) and unpinned(cached_user(key))
+
+
+async def areads_replica(request):
+    if not replica_route(request):
+        return False
+    key = token_key(request)
+    if not key:
+        return key is None
+    user = await acached_user(key)
+    return user is not None and not await cache.aget(pin_key(user.pk))
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтения на время запроса.
+
+    Работает и в синхронной, и в асинхронной цепочке: под ASGI запрос
+    не переходит в поток ради выбора базы.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_alias.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            read_alias.reset(token)
+
+    async def __acall__(self, request):
+        token = read_alias.set(None)
+        try:
+            return await self.get_response(request)
+        finally:
+            read_alias.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if reads_replica(request):
+            read_alias.set(choose_replica())
+
+    async def aprocess_view(self, request, view_func, view_args,
+                            view_kwargs):
+        if await areads_replica(request):
+            read_alias.set(await achoose_replica())
+
+
+class ReplicaRouter:
+    """Чтение — из выбранной для запроса реплики, запись — в основную."""
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики хранят те же данные, что и основная база.
+        return True
@@ -1,13 +1,20 @@
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import exceptions, serializers, status
 from rest_framework.validators import UniqueTogetherValidator
 
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from recipes.autocomplete import ingredient_index
+from recipes.models import (CartIngredientTotal, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.reference import tag_cache
+from recipes.shopping_list import recipe_ingredients_change
 from users.models import CustomUser, Follow
 
-from .mixins import FollowMixin
+from .fields import (ImageVariantField, ReferencePrimaryKeyField,
+                     UploadOrBase64ImageField)
+from .mixins import FollowMixin, user_memberships
+
+MAX_RECIPES_LIMIT = 50
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -51,7 +58,7 @@ class CustomUserSerializer(UserSerializer, FollowMixin):
 class RecipeItemSerializer(serializers.ModelSerializer):
     """Сериализатор обработки данных карточки рецепта."""
 
-    image = Base64ImageField()
+    image = ImageVariantField('thumbnail')
 
     class Meta:
         model = Recipe
@@ -69,7 +76,7 @@ class RecipeItemSerializer(serializers.ModelSerializer):
         )
 
 
-class FollowSerializer(serializers.ModelSerializer, FollowMixin):
+class FollowSerializer(serializers.ModelSerializer):
     """Сериализатор обработки данных о подписке пользователя."""
 
     id = serializers.ReadOnlyField(source='author.id')
@@ -81,17 +88,33 @@ class FollowSerializer(serializers.ModelSerializer, FollowMixin):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
 
+    @staticmethod
+    def get_recipes_limit(request):
+        value = request.query_params.get('recipes_limit')
+        if value is None:
+            return MAX_RECIPES_LIMIT
+        if not value.isdigit() or int(value) < 1:
+            raise serializers.ValidationError(
+                {'recipes_limit': 'Ожидается целое число больше нуля.'})
+        return min(int(value), MAX_RECIPES_LIMIT)
+
     @staticmethod
     def get_recipes_count(obj):
-        return obj.recipes.count()
+        return obj.author.recipes_count
+
+    def get_is_subscribed(self, obj):
+        user = self.context.get('request').user
+        return obj.user_id == user.id
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
-        if recipes_limit:
-            queryset = queryset[: int(recipes_limit)]
-        return RecipeItemSerializer(queryset, many=True).data
+        recipes = self.context.get('recipes')
+        if recipes is None:
+            limit = self.context.get('recipes_limit') or (
+                self.get_recipes_limit(self.context.get('request')))
+            recipes = {obj.author_id: Recipe.objects.filter(
+                author=obj.author_id)[:limit]}
+        return RecipeItemSerializer(
+            recipes.get(obj.author_id, ()), many=True).data
 
     def validate(self, data):
         author = self.context.get('author')
@@ -144,9 +167,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 class RecipeCreateIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор создания ингредиента рецепта."""
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-    )
+    id = ReferencePrimaryKeyField(ingredient_index)
     amount = serializers.IntegerField()
 
     class Meta:
@@ -157,18 +178,19 @@ class RecipeCreateIngredientSerializer(serializers.ModelSerializer):
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор обработки данных ингредиента в рецепте."""
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient.id',
-    )
-    name = serializers.CharField(
-        read_only=True,
-        source='ingredient.name',
-    )
-    measurement_unit = serializers.CharField(
-        read_only=True,
-        source='ingredient.measurement_unit',
-    )
+    id = serializers.ReadOnlyField(source='ingredient_id')
+    name = serializers.SerializerMethodField()
+    measurement_unit = serializers.SerializerMethodField()
+
+    @staticmethod
+    def get_ingredient(obj):
+        return ingredient_index.get(obj.ingredient_id) or obj.ingredient
+
+    def get_name(self, obj):
+        return self.get_ingredient(obj).name
+
+    def get_measurement_unit(self, obj):
+        return self.get_ingredient(obj).measurement_unit
 
     class Meta:
         model = RecipeIngredient
@@ -186,27 +208,57 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
     author = CustomUserSerializer(read_only=True)
     name = serializers.CharField(max_length=200)
-    image = Base64ImageField()
+    # Без фото при изменении рецепта остаётся прежний файл.
+    image = UploadOrBase64ImageField(required=False)
     ingredients = RecipeCreateIngredientSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
-    )
+    tags = ReferencePrimaryKeyField(tag_cache, many=True)
     cooking_time = serializers.IntegerField()
 
     @staticmethod
     def create_ingredients(ingredients, recipe):
-        for ingredient in ingredients:
-            RecipeIngredient.objects.create(
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
                 recipe=recipe,
                 ingredient=ingredient['id'],
                 amount=ingredient['amount'],
             )
+            for ingredient in ingredients
+        )
 
-    @staticmethod
-    def create_tags(tags, recipe):
-        for tag in tags:
-            recipe.tags.add(tag)
+    @classmethod
+    def update_ingredients(cls, ingredients, recipe):
+        """Пишет только добавленные, удалённые и изменённые строки."""
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        current = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(
+                recipe=recipe).only('id', 'ingredient_id', 'amount')
+        }
+        removed = current.keys() - amounts.keys()
+        added = [
+            ingredient for ingredient in ingredients
+            if ingredient['id'].id not in current
+        ]
+        changed = [
+            item for ingredient_id, item in current.items()
+            if ingredient_id in amounts
+            and item.amount != amounts[ingredient_id]
+        ]
+        if not (removed or added or changed):
+            return
+        for item in changed:
+            item.amount = amounts[item.ingredient_id]
+        with recipe_ingredients_change(recipe.id):
+            if removed:
+                RecipeIngredient.objects.filter(
+                    recipe=recipe, ingredient_id__in=removed).delete()
+            if changed:
+                RecipeIngredient.objects.bulk_update(changed, ('amount',))
+            if added:
+                cls.create_ingredients(added, recipe)
 
     @staticmethod
     def validate_ingredients(data):
@@ -214,19 +266,14 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise exceptions.ValidationError(
                 'Необходимо выбрать хотя бы один ингредиент.'
             )
-        ingredients_list = []
-        for ingredient in data:
-            ingredient_id = ingredient['id']
-            if ingredient_id in ingredients_list:
-                raise exceptions.ValidationError(
-                    'Необходимо исключить дублирование ингредиентов.'
-                )
-            ingredients_list.append(ingredient_id)
-            amount = ingredient['amount']
-            if int(amount) <= 0:
-                raise exceptions.ValidationError(
-                    'Количество ингредиента должно быть больше нуля.'
-                )
+        if len({ingredient['id'].id for ingredient in data}) < len(data):
+            raise exceptions.ValidationError(
+                'Необходимо исключить дублирование ингредиентов.'
+            )
+        if any(ingredient['amount'] <= 0 for ingredient in data):
+            raise exceptions.ValidationError(
+                'Количество ингредиента должно быть больше нуля.'
+            )
         return data
 
     @staticmethod
@@ -235,13 +282,10 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise exceptions.ValidationError(
                 'Необходимо выбрать хотя бы один тег.'
             )
-        tag_list = []
-        for tag in data:
-            if tag in tag_list:
-                raise exceptions.ValidationError(
-                    'Теги должны быть уникальными.'
-                )
-            tag_list.append(tag)
+        if len({tag.id for tag in data}) < len(data):
+            raise exceptions.ValidationError(
+                'Теги должны быть уникальными.'
+            )
         return data
 
     @staticmethod
@@ -252,22 +296,40 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
         return value
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(author=author, **validated_data)
-        self.create_tags(tags, recipe)
+        recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
-        recipe.tags.clear()
-        RecipeIngredient.objects.filter(recipe=recipe).delete()
-        self.create_tags(validated_data.pop('tags'), recipe)
-        self.create_ingredients(validated_data.pop('ingredients'), recipe)
+        recipe.tags.set(validated_data.pop('tags'))
+        self.update_ingredients(validated_data.pop('ingredients'), recipe)
         return super().update(recipe, validated_data)
 
+    def validate(self, data):
+        if not data.get('image'):
+            if self.instance is None:
+                raise exceptions.ValidationError({
+                    'image': self.fields['image'].error_messages['required']
+                })
+            data.pop('image', None)
+        name = data.get('name', getattr(self.instance, 'name', None))
+        text = data.get('text', getattr(self.instance, 'text', None))
+        duplicates = Recipe.objects.filter(
+            content_hash=Recipe.content_digest(name, text), name=name)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise exceptions.ValidationError(
+                'Рецепт с таким названием уже есть в базе.')
+        return data
+
     def to_representation(self, recipe):
         return RecipeListSerializer(recipe, context=self.context).data
 
@@ -283,20 +345,13 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'tags',
             'cooking_time',
         )
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Recipe.objects.all(),
-                fields=('name', 'text'),
-                message='Рецепт с таким названием уже есть в базе.',
-            )
-        ]
 
 
 class RecipeListSerializer(serializers.ModelSerializer):
     """Сериализатор отображения рецепта."""
 
     author = CustomUserSerializer(read_only=True)
-    image = Base64ImageField()
+    image = ImageVariantField()
     ingredients = RecipeIngredientSerializer(
         read_only=True,
         source='recipe_ingredient',
@@ -306,19 +361,17 @@ class RecipeListSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
-    def get_is_favorited(self, obj):
+    def get_flag(self, obj, kind):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        return Favorite.objects.filter(
-            user=request.user, recipe=obj).exists()
+        return obj.id in user_memberships(request)[kind]
+
+    def get_is_favorited(self, obj):
+        return self.get_flag(obj, 'favorites')
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return ShoppingCart.objects.filter(
-            user=request.user, recipe=obj).exists()
+        return self.get_flag(obj, 'cart')
 
     class Meta:
         model = Recipe
@@ -401,3 +454,13 @@ class CartSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(
                     'Рецепт уже был добавлен в список покупок!')
         return data
+
+
+class CartIngredientTotalSerializer(RecipeIngredientSerializer):
+    """Сериализатор суммы ингредиента в списке покупок."""
+
+    amount = serializers.ReadOnlyField(source='total_amount')
+
+    class Meta:
+        model = CartIngredientTotal
+        fields = ('id', 'name', 'measurement_unit', 'amount')
@@ -0,0 +1,37 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser, Follow
+
+from .authentication import forget_user
+from .replicas import pin
+
+# Поля, которые не влияют на аутентификацию и данные пользователя.
+SILENT_USER_FIELDS = {'last_login', 'recipes_count', 'followers_count'}
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    forget_user(instance.user_id)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(instance, update_fields=None, **kwargs):
+    # Смена пароля, деактивация и правка профиля.
+    if not update_fields or not set(update_fields) <= SILENT_USER_FIELDS:
+        forget_user(instance.pk)
+        pin(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_written(instance, **kwargs):
+    pin(instance.author_id)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Follow)
+def membership_written(instance, **kwargs):
+    pin(instance.user_id)
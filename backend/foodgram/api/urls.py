@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
+from .async_views import async_routes
 from .views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
                     TagViewSet)
 
@@ -10,8 +12,12 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 
+routes = router.urls
+if settings.ASYNC_READ_VIEWS:
+    routes = async_routes(routes)
+
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(routes)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,7 +1,7 @@
-from datetime import datetime as dt
+from functools import partial
 
-from django.db.models import Sum
-from django.http.response import HttpResponse
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
@@ -9,19 +9,43 @@ from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+from recipes import json_rows, shopping_list
+from recipes.autocomplete import ingredient_index
+from recipes.counters import shift_counter
+from recipes.reference import tag_cache
+from recipes.models import (CartIngredientTotal, Favorite, Ingredient, Recipe,
                             ShoppingCart, Tag)
 from users.models import CustomUser, Follow
 
+from .conditional import (conditional, ingredient_validators,
+                          recipe_detail_validators, recipe_list_validators,
+                          tag_validators)
+from .fields import file_url
 from .filters import IngredientLookupFilter, RecipeFilter
-from .pagination import CustomPageNumberPagination
+from .fragments import VERSION_FIELDS, recipe_fragments
+from .list_cache import anonymous_request, cached_list, overlay
+from .negotiation import FileFormatNegotiation
+from .pagination import FeedPagination
+from .parsers import MultiPartJSONParser
 from .permissions import AdminOrReadOnly, AuthorOrReadOnly
-from .serializers import (CartSerializer, CustomUserSerializer,
-                          FavoriteSerializer, FollowSerializer,
-                          IngredientSerializer, RecipeCreateSerializer,
-                          RecipeListSerializer, TagSerializer)
+from .serializers import (CartIngredientTotalSerializer, CartSerializer,
+                          CustomUserSerializer, FavoriteSerializer,
+                          FollowSerializer, IngredientSerializer,
+                          RecipeCreateSerializer, RecipeListSerializer,
+                          TagSerializer)
+
+
+def file_response(content, file_format, chunks):
+    """Файл списка покупок частями из chunks."""
+    response = StreamingHttpResponse(
+        chunks, content_type=shopping_list.RENDERERS[file_format][0])
+    response['Content-Length'] = len(content)
+    response['Content-Disposition'] = (
+        f'attachment; filename=shopping-list.{file_format}')
+    return response
 
 
 class CustomUserViewSet(UserViewSet):
@@ -57,21 +81,29 @@ class CustomUserViewSet(UserViewSet):
             pagination_class=None,
             permission_classes=(IsAuthenticated,))
     def me(self, request):
-        serializer = CustomUserSerializer(request.user)
+        serializer = CustomUserSerializer(
+            request.user, context={'request': request})
         return Response(serializer.data,
                         status=status.HTTP_200_OK)
 
     @action(
         detail=False, methods=['GET'],
         permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination,
         url_path='subscriptions',
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = Follow.objects.filter(user=user)
+        recipes_limit = FollowSerializer.get_recipes_limit(request)
+        queryset = Follow.objects.filter(user=user).select_related('author')
         page = self.paginate_queryset(queryset)
-        serializer = FollowSerializer(page, many=True,
-                                      context={'request': request})
+        recipes = {}
+        for recipe in Recipe.objects.latest_by_authors(
+                [follow.author_id for follow in page], recipes_limit):
+            recipes.setdefault(recipe.author_id, []).append(recipe)
+        serializer = FollowSerializer(
+            page, many=True,
+            context={'request': request, 'recipes': recipes})
         return self.get_paginated_response(serializer.data)
 
     @action(
@@ -83,17 +115,24 @@ class CustomUserViewSet(UserViewSet):
         user = request.user
         author = get_object_or_404(CustomUser, id=id)
         if request.method == 'POST':
+            # Параметры ответа проверяются до записи подписки.
+            recipes_limit = FollowSerializer.get_recipes_limit(request)
             serializer = FollowSerializer(
                 data=request.data,
-                context={'request': request, 'author': author})
+                context={'request': request, 'author': author,
+                         'recipes_limit': recipes_limit})
             serializer.is_valid(raise_exception=True)
-            serializer.save(author=author, user=user)
+            with transaction.atomic():
+                serializer.save(author=author, user=user)
+                shift_counter(CustomUser, author.id, 'followers_count', 1)
             return Response({'Подписка успешно создана': serializer.data},
                             status=status.HTTP_201_CREATED)
         if request.method == 'DELETE':
-            follow = Follow.objects.filter(user=user, author=author)
-            if follow.exists():
-                follow.delete()
+            with transaction.atomic():
+                deleted, _ = Follow.objects.filter(
+                    user=user, author=author).delete()
+                shift_counter(CustomUser, author.id, 'followers_count',
+                              -deleted)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'subscribe': 'Ранее вы уже отписались от этого автора.'},
@@ -109,6 +148,17 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (AdminOrReadOnly,)
     pagination_class = None
 
+    @conditional(tag_validators)
+    def list(self, request, *args, **kwargs):
+        return Response(TagSerializer(tag_cache.all(), many=True).data)
+
+    @conditional(tag_validators)
+    def retrieve(self, request, pk=None):
+        tag = pk.isdigit() and tag_cache.get(int(pk))
+        if not tag:
+            raise Http404
+        return Response(TagSerializer(tag).data)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """Представление для обработки запросов к ресурсу ингредиентов."""
@@ -120,21 +170,108 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientLookupFilter
 
+    @conditional(ingredient_validators)
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return Response(ingredient_index.rows())
+        return Response(ingredient_index.search(name))
+
+    @conditional(ingredient_validators)
+    def retrieve(self, request, pk=None):
+        ingredient = pk.isdigit() and ingredient_index.row(int(pk))
+        if not ingredient:
+            raise Http404
+        return Response(ingredient)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Представление для обработки запросов к ресурсу рецептов."""
 
     queryset = Recipe.objects.all()
     permission_classes = (AuthorOrReadOnly,)
-    pagination_class = CustomPageNumberPagination
+    pagination_class = FeedPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    parser_classes = (JSONParser, MultiPartJSONParser)
 
-    @staticmethod
-    def post_favorite(model, user, recipe):
-        model_create, create = model.objects.get_or_create(
-            user=user, recipe=recipe
-        )
+    counters = {
+        Favorite: 'favorites_count',
+        ShoppingCart: 'in_carts_count',
+    }
+
+    def get_queryset(self):
+        return Recipe.objects.with_related()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['image_variant'] = 'card'
+        return context
+
+    def build_fragments(self, ids, variant=None):
+        """Анонимные представления рецептов ids по их id."""
+        queryset = Recipe.objects.with_related().filter(pk__in=ids)
+        if json_rows.supported(queryset):
+            url = partial(file_url, request=self.request)
+            recipes = [
+                json_rows.decode(row, variant, url)
+                for row in json_rows.recipe_rows(queryset)
+            ]
+        else:
+            recipes = RecipeListSerializer(queryset, many=True, context={
+                'request': anonymous_request(self.request),
+                'image_variant': variant,
+            }).data
+        return {recipe['id']: recipe for recipe in recipes}
+
+    def fragments(self, rows, variant=None):
+        recipes = recipe_fragments(
+            rows, self.request,
+            partial(self.build_fragments, variant=variant), variant)
+        if self.request.user.is_authenticated:
+            overlay(recipes, self.request)
+        return recipes
+
+    def version_rows(self):
+        return self.filter_queryset(self.get_queryset()).prefetch_related(
+            None).values(*VERSION_FIELDS)
+
+    @conditional(recipe_list_validators)
+    def list(self, request, *args, **kwargs):
+        def build(request):
+            page = self.paginate_queryset(self.version_rows())
+            return self.get_paginated_response(self.fragments(page, 'card'))
+        return cached_list(self, request, build)
+
+    @conditional(recipe_detail_validators)
+    def retrieve(self, request, *args, **kwargs):
+        # Чтение разрешено всем, проверка прав на объект не нужна.
+        row = get_object_or_404(self.version_rows(), pk=kwargs['pk'])
+        recipes = self.fragments((row,))
+        if not recipes:
+            # Рецепт удалён между чтением версии и сборкой представления.
+            raise Http404
+        return Response(recipes[0])
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            recipe = serializer.save()
+            shift_counter(CustomUser, recipe.author_id, 'recipes_count', 1)
+
+    def perform_destroy(self, recipe):
+        with transaction.atomic():
+            recipe.delete()
+            shift_counter(CustomUser, recipe.author_id, 'recipes_count', -1)
+
+    @classmethod
+    def post_favorite(cls, model, user, recipe):
+        with transaction.atomic():
+            model_create, create = model.objects.get_or_create(
+                user=user, recipe=recipe
+            )
+            if create:
+                shift_counter(Recipe, recipe.id, cls.counters[model], 1)
         if create:
             serializer = FavoriteSerializer()
             return Response(
@@ -143,9 +280,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         return Response(status=status.HTTP_201_CREATED)
 
-    @staticmethod
-    def delete_favorite(model, user, recipe):
-        model.objects.filter(user=user, recipe=recipe).delete()
+    @classmethod
+    def delete_favorite(cls, model, user, recipe):
+        with transaction.atomic():
+            deleted, _ = model.objects.filter(
+                user=user, recipe=recipe).delete()
+            shift_counter(Recipe, recipe.id, cls.counters[model], -deleted)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_serializer_class(self):
@@ -187,31 +327,42 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer = CartSerializer(recipe, data=request.data,
                                         context={"request": request})
             serializer.is_valid(raise_exception=True)
-            ShoppingCart.objects.create(user=request.user, recipe=recipe)
+            with transaction.atomic():
+                ShoppingCart.objects.create(user=request.user, recipe=recipe)
+                shift_counter(Recipe, recipe.id, 'in_carts_count', 1)
             return Response(serializer.data,
                             status=status.HTTP_201_CREATED)
         if request.method == 'DELETE':
-            cart = ShoppingCart.objects.filter(recipe=recipe)
-            if cart.exists():
-                cart.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+            return self.delete_favorite(ShoppingCart, request.user, recipe)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['GET'],
             permission_classes=(IsAuthenticated,))
-    def download_shopping_cart(self, request, **kwargs):
-        ingredients = (
-            RecipeIngredient.objects
-            .filter(recipe__cart__user=request.user)
-            .values('ingredient')
-            .annotate(total_amount=Sum('amount'))
-            .values_list('ingredient__name', 'total_amount',
-                         'ingredient__measurement_unit')
+    def shopping_cart_summary(self, request):
+        totals = (
+            CartIngredientTotal.objects
+            .filter(user=request.user)
+            .order_by('ingredient__name')
         )
-        file_list = []
-        [file_list.append(
-            '{} - {} {}.'.format(*ingredient)) for ingredient in ingredients]
-        file = HttpResponse('Cписок покупок:\n' + '\n'.join(file_list),
-                            content_type='text/plain')
-        file['Content-Disposition'] = (f'attachment; filename={dt.now()}')
-        return file
+        return Response(
+            CartIngredientTotalSerializer(totals, many=True).data)
+
+    @action(detail=False, methods=['GET'],
+            permission_classes=(IsAuthenticated,),
+            content_negotiation_class=FileFormatNegotiation)
+    def download_shopping_cart(self, request, **kwargs):
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in shopping_list.RENDERERS:
+            return Response(
+                {'format': 'Допустимые форматы: {}.'.format(
+                    ', '.join(shopping_list.RENDERERS))},
+                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            content = shopping_list.export(request.user, file_format)
+        except shopping_list.ExportBusy:
+            return Response(
+                {'detail': 'Сервер занят, повторите выгрузку позже.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(shopping_list.PDF_TIMEOUT)})
+        return file_response(
+            content, file_format, shopping_list.chunks(content))
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
@@ -67,6 +68,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.replicas.ReplicaMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -113,6 +115,68 @@ DATABASES = {
     }
 }
 
+# Read replicas: one alias per host in DB_REPLICA_HOSTS ("host[:port],...")
+REPLICA_DATABASES = []
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = replica.strip().partition(':')
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+
+# Read-your-writes: seconds a user reads from the primary after a write
+REPLICA_PIN_SECONDS = float(os.getenv('REPLICA_PIN_SECONDS', 5))
+# Seconds between health checks of a replica in each process
+REPLICA_HEALTH_INTERVAL = float(os.getenv('REPLICA_HEALTH_INTERVAL', 10))
+
+# Cache shared by all workers of the container
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Versions, locks and rebuild flags rely on an atomic cache.add() and must
+# not be culled: use Redis or Memcached. FileBasedCache.add() is not atomic
+# across processes, so it only suits a single-process development server.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://redis:6379/1'),
+    }
+}
+if CACHES['default']['BACKEND'].endswith('FileBasedCache'):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+    }
+
+# Token authentication cache: per-process LRU in front of the shared cache
+AUTH_TOKEN_LRU_SIZE = int(os.getenv('AUTH_TOKEN_LRU_SIZE', 1024))
+AUTH_TOKEN_LRU_TTL = float(os.getenv('AUTH_TOKEN_LRU_TTL', 5))
+
+# Coroutine routes for hot read paths; enable when served by an ASGI server
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+
+# Recipe list and detail rendered to JSON by the database
+RECIPE_SQL_JSON = os.getenv('RECIPE_SQL_JSON', 'True') == 'True'
+
+# Cache alias for anonymous recipe list pages
+RECIPE_LIST_CACHE = os.getenv('RECIPE_LIST_CACHE', 'default')
+
+# Background pool building resized recipe images (0 builds them inline)
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+# Shopping list export: simultaneous PDF renderings across all workers
+SHOPPING_LIST_PDF_WORKERS = int(os.getenv('SHOPPING_LIST_PDF_WORKERS', 2))
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -159,13 +223,13 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_PAGINATION_CLASS':
-        'rest_framework.pagination.PageNumberPagination',
+        'api.pagination.CustomPageNumberPagination',
     'PAGE_SIZE': 6,
 }
 
@@ -1,8 +1,9 @@
 from django.conf import settings
 from django.contrib import admin
 
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+from .models import (CartIngredientTotal, Favorite, Ingredient, Recipe,
+                     RecipeIngredient, ShoppingCart, Tag)
+from .shopping_list import recipe_ingredients_change
 
 EMPTY_VALUE = settings.DEFAULT_LABEL_VALUE
 
@@ -24,12 +25,9 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('author', 'name', 'favorites_counter')
+    list_display = ('author', 'name', 'favorites_count', 'in_carts_count')
     list_filter = ('author', 'name', 'tags')
 
-    def favorites_counter(self, obj):
-        return obj.favorites.count()
-
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
@@ -40,6 +38,23 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
         'ingredient',
     )
 
+    def get_readonly_fields(self, request, obj=None):
+        return ('recipe',) if obj else ()
+
+    def save_model(self, request, obj, form, change):
+        with recipe_ingredients_change(obj.recipe_id):
+            super().save_model(request, obj, form, change)
+            obj.recipe.save(update_fields=('updated_at',))
+
+    def delete_model(self, request, obj):
+        with recipe_ingredients_change(obj.recipe_id):
+            super().delete_model(request, obj)
+            obj.recipe.save(update_fields=('updated_at',))
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_model(request, obj)
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -59,3 +74,10 @@ class CartAdmin(admin.ModelAdmin):
         'user',
         'recipe',
     )
+
+
+@admin.register(CartIngredientTotal)
+class CartIngredientTotalAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'ingredient', 'total_amount')
+    list_filter = ('user',)
+    readonly_fields = ('user', 'ingredient', 'total_amount')
@@ -0,0 +1,71 @@
+"""Индекс ингредиентов в памяти процесса для автодополнения.
+
+Индекс — надстройка над справочником ингредиентов и перестраивается
+вместе с ним, когда меняется версия каталога.
+"""
+from bisect import bisect_left
+
+from .models import Ingredient
+from .reference import ReferenceCache
+
+SEARCH_LIMIT = 50
+
+
+def fold(text):
+    return text.casefold().strip()
+
+
+def search_index(built, query, limit=SEARCH_LIMIT):
+    """Поиск по структуре из IngredientIndex.build."""
+    keys, items, _ = built
+    query = fold(query)
+    if not query:
+        return items[:limit]
+    start = bisect_left(keys, query)
+    end = bisect_left(keys, query + '\U0010ffff', start)
+    result = items[start:min(end, start + limit)]
+    if len(result) < limit:
+        matches = sorted(
+            (position, index)
+            for index, position in enumerate(
+                key.find(query, 1) for key in keys)
+            if position > 0 and not start <= index < end
+        )
+        result.extend(
+            items[index]
+            for _, index in matches[:limit - len(result)]
+        )
+    return result
+
+
+class IngredientIndex(ReferenceCache):
+    """Отсортированный по названию каталог с поиском по префиксу.
+
+    Точные совпадения идут первыми, затем совпадения по префиксу,
+    затем по подстроке — по позиции вхождения.
+    """
+
+    def build(self, objects):
+        rows = sorted(
+            (fold(obj.name), obj.pk, {
+                'id': obj.pk,
+                'name': obj.name,
+                'measurement_unit': obj.measurement_unit,
+            })
+            for obj in objects
+        )
+        keys = [key for key, _, _ in rows]
+        items = [item for _, _, item in rows]
+        return keys, items, {item['id']: item for item in items}
+
+    def rows(self):
+        return self.state()[3][1]
+
+    def row(self, pk):
+        return self.state()[3][2].get(pk)
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        return search_index(self.state()[3], query, limit)
+
+
+ingredient_index = IngredientIndex(Ingredient)
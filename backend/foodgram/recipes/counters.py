@@ -0,0 +1,52 @@
+"""Денормализованные счётчики рецептов и пользователей.
+
+Счётчики меняются выражениями F() в той же транзакции, что и сама
+запись, поэтому параллельные запросы не теряют обновлений. Расхождения,
+например после правок в админке, исправляет команда recount.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import CustomUser, Follow
+
+from .models import Favorite, Recipe, ShoppingCart
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (CustomUser, 'recipes_count', Recipe, 'author'),
+    (CustomUser, 'followers_count', Follow, 'author'),
+)
+
+
+def shift_counter(model, pk, field, delta):
+    if delta:
+        model.objects.filter(pk=pk).update(
+            **{field: Greatest(F(field) + delta, 0)})
+
+
+def actual_count(related_model, related_field):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{related_field: OuterRef('pk')})
+            .order_by()
+            .values(related_field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def recount(model, field, related_model, related_field, start, stop):
+    """Исправляет счётчик у записей с pk из [start, stop).
+
+    Возвращает число исправленных записей.
+    """
+    actual = actual_count(related_model, related_field)
+    return (
+        model.objects.filter(pk__gte=start, pk__lt=stop)
+        .annotate(actual=actual)
+        .exclude(**{field: F('actual')})
+        .update(**{field: actual})
+    )
@@ -0,0 +1,104 @@
+"""Уменьшенные варианты фото рецепта.
+
+После сохранения рецепта с новым фото варианты строятся в фоновом пуле
+потоков: кадрирование под фиксированный размер, без метаданных, в WebP
+(или JPEG, если Pillow собран без WebP). Имена файлов содержат хеш
+содержимого, поэтому их можно кешировать навсегда. Пока вариантов нет,
+клиенты получают оригинал.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .models import Recipe
+from .versions import recipes_version
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (740, 480),
+}
+VARIANTS_DIR = 'recipe_images/variants'
+FORMAT, EXTENSION = (
+    ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg'))
+QUALITY = 80
+
+_pool = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='recipe-images',
+) if settings.IMAGE_WORKERS else None
+
+
+def render_variant(original, size):
+    image = ImageOps.fit(original, size, Image.LANCZOS).convert('RGB')
+    buffer = io.BytesIO()
+    # Новое изображение не несёт EXIF и прочих метаданных оригинала.
+    image.save(buffer, FORMAT, quality=QUALITY)
+    return buffer.getvalue()
+
+
+def store(content, variant):
+    digest = sha256(content).hexdigest()[:20]
+    name = f'{VARIANTS_DIR}/{digest}_{variant}.{EXTENSION}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    return name
+
+
+def build_variants(recipe_id, source):
+    """Строит варианты и сохраняет их, если фото рецепта не сменилось."""
+    with default_storage.open(source) as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    variants = {
+        variant: store(render_variant(original, size), variant)
+        for variant, size in VARIANTS.items()
+    }
+    variants['source'] = source
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_variants=variants, updated_at=timezone.now())
+    if updated:
+        recipes_version.bump()
+
+
+def run(recipe_id, source, in_worker):
+    try:
+        build_variants(recipe_id, source)
+    except Exception:
+        logger.exception('Не удалось построить варианты фото %s', source)
+    finally:
+        if in_worker:
+            connections.close_all()
+
+
+def schedule_variants(recipe):
+    """Ставит построение вариантов в очередь после фиксации транзакции."""
+    source = recipe.image.name
+    if not source or recipe.image_variants.get('source') == source:
+        return
+    if _pool is None:
+        transaction.on_commit(lambda: run(recipe.id, source, False))
+    else:
+        transaction.on_commit(
+            lambda: _pool.submit(run, recipe.id, source, True))
+
+
+def pick_variant(image, variants, variant):
+    """Имя файла варианта по полям image и image_variants рецепта."""
+    if variant and variants.get('source') == image:
+        return variants.get(variant, image)
+    return image
+
+
+def variant_name(recipe, variant):
+    """Имя файла варианта, а пока его нет — оригинала."""
+    return pick_variant(recipe.image.name, recipe.image_variants, variant)
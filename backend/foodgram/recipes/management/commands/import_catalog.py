@@ -0,0 +1,184 @@
+import csv
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from recipes.autocomplete import ingredient_index
+from recipes.models import Ingredient, Tag
+from recipes.reference import tag_cache
+
+from ..utils import chunks, iter_json_array
+
+INGREDIENT = 'recipes.ingredient'
+TAG = 'recipes.tag'
+
+
+def read_csv(stream):
+    for row in csv.reader(stream):
+        if len(row) == 2:
+            yield INGREDIENT, {'name': row[0], 'measurement_unit': row[1]}
+        else:
+            yield None, row
+
+
+def read_json(stream):
+    """Принимает фикстуры Django и плоские списки ингредиентов или тегов."""
+    for item in iter_json_array(stream):
+        if not isinstance(item, dict):
+            yield None, item
+        elif 'model' in item:
+            yield item['model'].lower(), item.get('fields', {})
+        elif 'measurement_unit' in item:
+            yield INGREDIENT, item
+        elif 'slug' in item:
+            yield TAG, item
+        else:
+            yield None, item
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает ингредиенты и теги из CSV или JSON, '
+        'обновляя существующие записи пакетами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('csv', 'json'))
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, path, **options):
+        file_format = options['format'] or Path(path).suffix.lstrip('.')
+        readers = {'csv': read_csv, 'json': read_json}
+        if file_format not in readers:
+            raise CommandError('Укажите --format csv или json.')
+        self.dry_run = options['dry_run']
+        self.stats = Counter()
+        self.changed = Counter()
+        try:
+            with open(path, encoding='utf-8') as stream:
+                rows = readers[file_format](stream)
+                for batch in chunks(rows, options['batch_size']):
+                    self.import_batch(batch)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        except IntegrityError as error:
+            raise CommandError(f'Конфликт данных в {path}: {error}')
+        finally:
+            if not self.dry_run:
+                self.invalidate()
+        prefix = 'Проверка без записи. ' if self.dry_run else ''
+        self.stdout.write(
+            f'{prefix}Добавлено: {self.stats["inserted"]}, '
+            f'обновлено: {self.stats["updated"]}, '
+            f'пропущено: {self.stats["skipped"]}.'
+        )
+
+    def invalidate(self):
+        if self.changed[Ingredient]:
+            ingredient_index.invalidate()
+        if self.changed[Tag]:
+            tag_cache.invalidate()
+
+    @staticmethod
+    def is_valid(fields, names):
+        return all(
+            isinstance(fields.get(name), str) and fields[name].strip()
+            for name in names
+        )
+
+    def import_batch(self, batch):
+        ingredients = {}
+        tags = {}
+        valid = 0
+        for model, fields in batch:
+            if model == INGREDIENT and self.is_valid(
+                    fields, ('name', 'measurement_unit')):
+                name = fields['name'].strip()
+                unit = fields['measurement_unit'].strip()
+                ingredients[name, unit] = Ingredient(
+                    name=name, measurement_unit=unit)
+            elif model == TAG and self.is_valid(
+                    fields, ('name', 'slug', 'color')):
+                tags[fields['slug']] = Tag(
+                    name=fields['name'], slug=fields['slug'],
+                    color=fields['color'],
+                )
+            else:
+                self.stats['skipped'] += 1
+                continue
+            valid += 1
+        self.stats['skipped'] += valid - len(ingredients) - len(tags)
+        with transaction.atomic():
+            self.upsert_ingredients(ingredients)
+            self.upsert_tags(tags)
+
+    def upsert_ingredients(self, ingredients):
+        """Ингредиент целиком определяется ключом distinct_measurement.
+
+        Обновлять у существующей записи нечего, поэтому известные ключи
+        пропускаются, а новые вставляются одним запросом.
+        """
+        if not ingredients:
+            return
+        existing = set(
+            Ingredient.objects.filter(
+                name__in={name for name, _ in ingredients},
+            ).values_list('name', 'measurement_unit')
+        )
+        new = [row for key, row in ingredients.items()
+               if key not in existing]
+        self.stats['inserted'] += len(new)
+        self.stats['skipped'] += len(ingredients) - len(new)
+        self.changed[Ingredient] += len(new)
+        if new and not self.dry_run:
+            Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+
+    def upsert_tags(self, tags):
+        """Вставка и обновление тегов по slug.
+
+        Название и цвет тоже уникальны: тег, чьё название или цвет занят
+        другим slug в базе или ранее в пакете, пропускается.
+        """
+        if not tags:
+            return
+        existing = {
+            tag.slug: tag for tag in Tag.objects.filter(slug__in=tags)
+        }
+        # Занятые название и цвет: ключ -> slug владельца.
+        taken = {}
+        others = Tag.objects.exclude(slug__in=tags).filter(
+            Q(name__in={tag.name for tag in tags.values()})
+            | Q(color__in={tag.color for tag in tags.values()}),
+        )
+        for tag in (*others, *existing.values()):
+            taken.update({('name', tag.name): tag.slug,
+                          ('color', tag.color): tag.slug})
+        changed = []
+        for slug, tag in tags.items():
+            keys = (('name', tag.name), ('color', tag.color))
+            if any(taken.get(key, slug) != slug for key in keys):
+                self.stats['skipped'] += 1
+                continue
+            taken.update(dict.fromkeys(keys, slug))
+            current = existing.get(slug)
+            if current is None:
+                self.stats['inserted'] += 1
+            elif (current.name, current.color) != (tag.name, tag.color):
+                self.stats['updated'] += 1
+            else:
+                self.stats['skipped'] += 1
+                continue
+            changed.append(tag)
+        self.changed[Tag] += len(changed)
+        if changed and not self.dry_run:
+            Tag.objects.bulk_create(
+                changed,
+                update_conflicts=True,
+                unique_fields=('slug',),
+                update_fields=('name', 'color'),
+            )
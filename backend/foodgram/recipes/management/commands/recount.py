@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from recipes.counters import COUNTERS, recount
+from recipes.memberships import reset_memberships
+from recipes.models import Recipe
+from recipes.shopping_list import rebuild_cart_totals
+
+from ..utils import chunks
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики, суммы списков покупок '
+        'и хеши рецептов, сбрасывает кеш избранного и подписок и '
+        'исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, batch_size, **options):
+        for model, field, related_model, related_field in COUNTERS:
+            last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            repaired = sum(
+                recount(model, field, related_model, related_field,
+                        start, start + batch_size)
+                for start in range(0, last + 1, batch_size)
+            )
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}.{field}: '
+                f'исправлено {repaired}.'
+            )
+        rebuild_cart_totals(batch_size)
+        self.stdout.write('Суммы списков покупок пересобраны.')
+        reset_memberships()
+        self.fill_content_hashes(batch_size)
+
+    def fill_content_hashes(self, batch_size):
+        """Хеши рецептов, созданных через bulk_create или до появления поля."""
+        missing = Recipe.objects.filter(content_hash='').only('name', 'text')
+        filled = 0
+        for chunk in chunks(missing.iterator(chunk_size=batch_size),
+                            batch_size):
+            for recipe in chunk:
+                recipe.content_hash = Recipe.content_digest(
+                    recipe.name, recipe.text)
+            Recipe.objects.bulk_update(chunk, ('content_hash',))
+            filled += len(chunk)
+        self.stdout.write(f'Хеши рецептов: заполнено {filled}.')
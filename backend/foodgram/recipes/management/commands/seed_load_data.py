@@ -0,0 +1,197 @@
+import csv
+import random
+import time
+from array import array
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import CustomUser, Follow
+
+from ..utils import chunks
+
+CATALOG = settings.BASE_DIR.parent.parent / 'data' / 'ingredients.csv'
+TAGS = (
+    ('Завтрак', 'breakfast', Tag.ORANGE),
+    ('Обед', 'lunch', Tag.GREEN),
+    ('Ужин', 'dinner', Tag.PURPLE),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, рецептами, '
+        'избранным, списками покупок и подписками для нагрузочных тестов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=10)
+        parser.add_argument('--favorites', type=int, default=20000)
+        parser.add_argument('--carts', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument(
+            '--skew', type=float, default=3.0,
+            help='Степень перекоса популярности: 1 — равномерно.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--prefix', default='load',
+            help='Префикс логинов, позволяет дозаполнять базу повторно.',
+        )
+        parser.add_argument('--catalog', default=str(CATALOG))
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        if self.batch_size <= 0 or self.skew < 1:
+            raise CommandError('Неверные --batch-size или --skew.')
+
+        ingredients = self.load_catalog(options['catalog'])
+        tags = self.load_tags()
+        users = self.create_users(options['users'], options['prefix'])
+        recipes = self.create_recipes(
+            options['recipes'], options['ingredients_per_recipe'],
+            users, ingredients, tags,
+        )
+        self.create_pairs(
+            Favorite, options['favorites'], users, recipes, 'recipe_id')
+        self.create_pairs(
+            ShoppingCart, options['carts'], users, recipes, 'recipe_id')
+        self.create_pairs(Follow, options['follows'], users, users,
+                          'author_id')
+        call_command('recount', batch_size=self.batch_size,
+                     stdout=self.stdout)
+
+    def pick(self, ids):
+        """Выбор по степенному закону: первые элементы — самые популярные."""
+        return ids[int(len(ids) * self.random.random() ** self.skew)]
+
+    def sample(self, ids, count):
+        """random.sample по индексам: в Python 3.9 array не Sequence."""
+        return [ids[index] for index in self.random.sample(
+            range(len(ids)), count)]
+
+    def report(self, label, done, total, started):
+        rate = done / max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f'{label}: {done}/{total} ({rate:.0f} строк/с)')
+
+    def insert(self, label, model, rows, total, **kwargs):
+        started = time.monotonic()
+        done = 0
+        ids = array('q')
+        for chunk in chunks(rows, self.batch_size):
+            with transaction.atomic():
+                created = model.objects.bulk_create(chunk, **kwargs)
+            ids.extend(obj.pk for obj in created if obj.pk is not None)
+            done += len(chunk)
+            self.report(label, done, total, started)
+        return ids
+
+    def load_catalog(self, path):
+        try:
+            with open(path, encoding='utf-8') as catalog:
+                rows = [row for row in csv.reader(catalog) if len(row) == 2]
+        except OSError as error:
+            raise CommandError(f'Каталог ингредиентов недоступен: {error}')
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=name, measurement_unit=unit)
+             for name, unit in rows),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        ingredients = array(
+            'q', Ingredient.objects.order_by('id').values_list('id',
+                                                               flat=True))
+        if not ingredients:
+            raise CommandError('Каталог ингредиентов пуст.')
+        return ingredients
+
+    @staticmethod
+    def load_tags():
+        for name, slug, color in TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color})
+        return array('q', Tag.objects.values_list('id', flat=True))
+
+    def create_users(self, total, prefix):
+        password = make_password(None)
+        rows = (
+            CustomUser(
+                username=f'{prefix}_{number}',
+                email=f'{prefix}_{number}@load.test',
+                first_name='Пользователь',
+                last_name=str(number),
+                password=password,
+            )
+            for number in range(total)
+        )
+        users = self.insert('Пользователи', CustomUser, rows, total)
+        self.random.shuffle(users)
+        return users
+
+    def create_recipes(self, total, per_recipe, users, ingredients, tags):
+        if total and not users:
+            raise CommandError('Рецептам нужны авторы: задайте --users.')
+        per_recipe = min(per_recipe, len(ingredients))
+        started = time.monotonic()
+        recipes = array('q')
+        for chunk in chunks(range(total), self.batch_size):
+            with transaction.atomic():
+                created = Recipe.objects.bulk_create(
+                    Recipe(
+                        author_id=self.pick(users),
+                        name=f'Рецепт {number}',
+                        text='Синтетический рецепт для нагрузочных тестов.',
+                        cooking_time=self.random.randint(1, 180),
+                    )
+                    for number in chunk
+                )
+                RecipeIngredient.objects.bulk_create(
+                    RecipeIngredient(
+                        recipe_id=recipe.id,
+                        ingredient_id=ingredient_id,
+                        amount=self.random.randint(1, 1000),
+                    )
+                    for recipe in created
+                    for ingredient_id in self.sample(ingredients, per_recipe)
+                )
+                Recipe.tags.through.objects.bulk_create(
+                    Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+                    for recipe in created
+                    for tag_id in self.sample(
+                        tags, self.random.randint(1, len(tags)))
+                )
+            recipes.extend(recipe.id for recipe in created)
+            self.report('Рецепты', len(recipes), total, started)
+        self.random.shuffle(recipes)
+        return recipes
+
+    def create_pairs(self, model, total, users, targets, target_field):
+        """Пары с перекосом по активности пользователей и популярности.
+
+        Повторы отбрасываются ограничением уникальности, поэтому итоговое
+        число строк может быть немного меньше запрошенного.
+        """
+        if not total:
+            return
+        if not users or not targets:
+            raise CommandError(
+                f'{model._meta.verbose_name_plural}: нет данных для связи.')
+        pairs = ((self.pick(users), self.pick(targets))
+                 for _ in range(total))
+        rows = (
+            model(user_id=user_id, **{target_field: target_id})
+            for user_id, target_id in pairs
+            if targets is not users or user_id != target_id
+        )
+        self.insert(model._meta.verbose_name_plural, model, rows, total,
+                    ignore_conflicts=True)
@@ -0,0 +1,56 @@
+import json
+from itertools import islice
+
+READ_SIZE = 64 * 1024
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_json_array(stream):
+    """Поэлементно читает JSON-массив верхнего уровня из потока.
+
+    В памяти держится только текущий элемент и буфер чтения.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    while True:
+        chunk = stream.read(READ_SIZE)
+        buffer = (buffer + chunk).lstrip()
+        if not started:
+            if not buffer:
+                if chunk:
+                    continue
+                return
+            if buffer[0] != '[':
+                raise ValueError('Ожидался JSON-массив.')
+            buffer = buffer[1:]
+            started = True
+        while buffer:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            if not buffer:
+                break
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            rest = buffer[end:].lstrip()
+            if not rest[:1] or rest[0] not in ',]':
+                if chunk:
+                    break
+                raise ValueError('Некорректный JSON-массив.')
+            yield item
+            buffer = buffer[end:]
+        if not chunk:
+            raise ValueError('JSON-массив не закрыт.')
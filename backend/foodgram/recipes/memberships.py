@@ -0,0 +1,103 @@
+"""Избранное, список покупок и подписки пользователя в общем кеше.
+
+Для каждого пользователя хранятся отсортированные массивы id рецептов в
+избранном и в корзине и id авторов, на которых он подписан. Они
+загружаются одним запросом, а проверка «есть ли id в наборе» — это
+двоичный поиск, а не запрос, сколько бы записей ни было у пользователя.
+
+Запись помечена версией user_flags_version и общим поколением, которое
+меняет команда recount после массовых записей в обход сигналов.
+Изменение избранного, корзины или подписки после фиксации транзакции
+меняет версию, и запись перечитывается из базы одним запросом. Правка
+записи на месте потребовала бы атомарного чтения-изменения-записи в
+кеше, а гонка двух переключений теряла бы одно из них.
+"""
+from array import array
+from bisect import bisect_left
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import IntegerField, Value
+
+from users.models import Follow
+
+from .models import Favorite, ShoppingCart
+from .routing import primary
+from .versions import Version, user_flags_version
+
+KINDS = {
+    'favorites': (Favorite, 'recipe_id'),
+    'cart': (ShoppingCart, 'recipe_id'),
+    'follows': (Follow, 'author_id'),
+}
+CACHE_TIMEOUT = 60 * 60 * 24
+
+generation = Version('memberships:generation')
+
+
+class IdSet:
+    """Множество id на отсортированном массиве."""
+
+    def __init__(self, ids=()):
+        self.ids = array('q', sorted(set(ids)))
+
+    def __contains__(self, pk):
+        index = bisect_left(self.ids, pk)
+        return index < len(self.ids) and self.ids[index] == pk
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def entry_key(user_id):
+    return f'users:{user_id}:memberships'
+
+
+@primary()
+def load(user_id):
+    queries = [
+        model.objects.filter(user_id=user_id).order_by().values_list(
+            Value(number, output_field=IntegerField()), column)
+        for number, (model, column) in enumerate(KINDS.values())
+    ]
+    ids = [[] for _ in KINDS]
+    for number, pk in queries[0].union(*queries[1:], all=True):
+        ids[number].append(pk)
+    return {kind: IdSet(values) for kind, values in zip(KINDS, ids)}
+
+
+def reset_memberships():
+    """Устаревают записи всех пользователей."""
+    generation.touch()
+
+
+def memberships(user_id):
+    """Наборы id пользователя: favorites, cart и follows."""
+    version = (generation.get(), user_flags_version(user_id).get())
+    entry = cache.get(entry_key(user_id))
+    if entry is None or entry[0] != version:
+        entry = (version, load(user_id))
+        cache.set(entry_key(user_id), entry, CACHE_TIMEOUT)
+    return entry[1]
+
+
+async def amemberships(user_id):
+    """memberships() для асинхронных представлений."""
+    version = (await generation.aget(),
+               await user_flags_version(user_id).aget())
+    entry = await cache.aget(entry_key(user_id))
+    if entry is None or entry[0] != version:
+        return await sync_to_async(memberships)(user_id)
+    return entry[1]
+
+
+def record_change(instance):
+    """После фиксации строки избранного, корзины или подписки меняет
+    версию пользователя: запись перечитается из базы при следующем
+    обращении.
+    """
+    if instance.user_id is not None:
+        user_flags_version(instance.user_id).bump()
@@ -1,5 +1,10 @@
+from hashlib import sha256
+
+from django.contrib.postgres.search import SearchVectorField
 from django.core import validators
 from django.db import models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 
 from users.models import CustomUser
 
@@ -74,6 +79,32 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Выборка рецептов для отображения без запросов на каждую строку."""
+
+    def with_related(self):
+        # Флаги пользователя отвечают наборы id из recipes.memberships.
+        return self.defer('search_vector').select_related(
+            'author',
+        ).prefetch_related(
+            'tags',
+            'recipe_ingredient',
+        )
+
+    def latest_by_authors(self, author_ids, limit):
+        """Последние limit рецептов каждого автора одним запросом."""
+        return self.filter(author_id__in=author_ids).only(
+            'id', 'author_id', 'name', 'image', 'image_variants',
+            'cooking_time',
+        ).annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=F('id').desc(),
+            )
+        ).filter(row_number__lte=limit).order_by('author_id', '-id')
+
+
 class Recipe(models.Model):
     """Модель рецепта."""
 
@@ -93,6 +124,12 @@ class Recipe(models.Model):
         upload_to='recipe_images/',
         blank=True,
     )
+    # Имена файлов уменьшенных вариантов фото, см. recipes.images.
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField('Описание')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -107,6 +144,28 @@ class Recipe(models.Model):
         db_index=True,
     )
     cooking_time = models.PositiveIntegerField('Время приготовления')
+    search_vector = SearchVectorField(null=True, editable=False)
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False,
+    )
+    updated_at = models.DateTimeField('Изменён', auto_now=True)
+    # Индексированный хеш названия и описания для проверки уникальности
+    # без сравнения полного текста.
+    content_hash = models.CharField(
+        max_length=64,
+        default='',
+        editable=False,
+        db_index=True,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-id',)
@@ -116,6 +175,17 @@ class Recipe(models.Model):
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def content_digest(name, text):
+        return sha256(f'{name}\n{text}'.encode()).hexdigest()
+
+    def save(self, *args, update_fields=None, **kwargs):
+        self.content_hash = self.content_digest(self.name, self.text)
+        if update_fields is not None and {'name', 'text'} & set(
+                update_fields):
+            update_fields = {*update_fields, 'content_hash'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
 
 class RecipeIngredient(models.Model):
     """Модель ингредиента рецепта."""
@@ -215,3 +285,38 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} {self.recipe}'
+
+
+class CartIngredientTotal(models.Model):
+    """Сумма ингредиента в списке покупок пользователя.
+
+    Поддерживается при изменении корзины и ингредиентов рецепта,
+    см. recipes.shopping_list.
+    """
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.PositiveIntegerField('Количество', default=0)
+
+    class Meta:
+        verbose_name = 'Сумма ингредиента в списке покупок'
+        verbose_name_plural = 'Суммы ингредиентов в списках покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='distinct_cart_ingredient',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient} {self.total_amount}'
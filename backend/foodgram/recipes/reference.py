@@ -0,0 +1,81 @@
+"""Справочники в памяти процесса: теги и ингредиенты.
+
+Каждый воркер держит свою копию таблицы и сверяет её версию с ключом в
+общем кеше — это одно обращение к кешу вместо запроса к базе. Версию
+меняют сигналы моделей (админка) и команда import_catalog после
+фиксации транзакции, и все воркеры перечитывают таблицу при следующем
+обращении.
+"""
+import threading
+
+from asgiref.sync import sync_to_async
+
+from .models import Tag
+from .routing import primary
+from .versions import Version
+
+
+class ReferenceCache:
+    """Копия небольшой и редко меняющейся таблицы."""
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = f'reference:{model._meta.label_lower}:version'
+        self._version = Version(self.version_key)
+        self._lock = threading.Lock()
+        self._state = None
+
+    def __deepcopy__(self, memo):
+        # Общий для процесса объект: поля сериализаторов копируются
+        # при каждом создании, а копия справочника им не нужна.
+        return self
+
+    def version(self):
+        return self._version.get()
+
+    async def aversion(self):
+        return await self._version.aget()
+
+    def build(self, objects):
+        """Дополнительные структуры поверх загруженных записей."""
+        return None
+
+    @primary()
+    def load(self, version):
+        objects = list(self.model.objects.all())
+        by_id = {obj.pk: obj for obj in objects}
+        return version, objects, by_id, self.build(objects)
+
+    def state(self):
+        version = self.version()
+        state = self._state
+        if state is None or state[0] != version:
+            with self._lock:
+                state = self._state
+                if state is None or state[0] != version:
+                    state = self._state = self.load(version)
+        return state
+
+    async def astate(self):
+        """state() без обращения к базе, пока копия не устарела."""
+        state = self._state
+        if state is None or state[0] != await self.aversion():
+            state = await sync_to_async(self.state)()
+        return state
+
+    def all(self):
+        return self.state()[1]
+
+    def get(self, pk):
+        return self.state()[2].get(pk)
+
+    def in_bulk(self, ids):
+        by_id = self.state()[2]
+        return {pk: by_id[pk] for pk in ids if pk in by_id}
+
+    def invalidate(self):
+        """Сбрасывает копии всех процессов после фиксации транзакции."""
+        self._version.bump()
+
+
+tag_cache = ReferenceCache(Tag)
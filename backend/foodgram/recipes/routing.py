@@ -0,0 +1,23 @@
+"""Выбор базы для чтения.
+
+ReplicaMiddleware (api.replicas) ставит реплику для безопасных запросов
+в read_alias, а ReplicaRouter читает из неё. Всё, что заполняет общие
+кеши и копии справочников, читает из основной базы (primary): кеш
+помечается текущей версией, и данные отстающей реплики жили бы под ней
+до следующей смены версии.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Реплика для чтения в текущем запросе; None — основная база.
+read_alias = ContextVar('read_alias', default=None)
+
+
+@contextmanager
+def primary():
+    """Блок или функция, читающие из основной базы."""
+    token = read_alias.set(None)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
@@ -0,0 +1,77 @@
+"""Полнотекстовый поиск рецептов.
+
+В PostgreSQL колонку search_vector заполняет триггер по name и text с
+русской морфологией, а поиск идёт по двум GIN-индексам: tsvector и
+триграммам названия, которые ловят опечатки. Остальные СУБД получают
+простой поиск по вхождению подстроки.
+"""
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramWordSimilarity)
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+SEARCH_CONFIG = 'russian'
+
+INSTALL_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f"""
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}',
+                                  coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}',
+                                  coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector ON recipes_recipe',
+    """
+    CREATE TRIGGER recipes_recipe_search_vector
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update()
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin
+    ON recipes_recipe USING gin (search_vector)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS recipes_recipe_name_trgm
+    ON recipes_recipe USING gin (name gin_trgm_ops)
+    """,
+    # Заполняет вектор у рецептов, созданных до появления триггера.
+    """
+    UPDATE recipes_recipe SET name = name WHERE search_vector IS NULL
+    """,
+)
+
+
+def install_search(using):
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for statement in INSTALL_SQL:
+            cursor.execute(statement)
+
+
+def search_recipes(queryset, text):
+    """Отбирает рецепты по запросу и сортирует их по релевантности."""
+    text = text.strip()
+    if not text:
+        return queryset
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.filter(
+            Q(name__icontains=text) | Q(text__icontains=text))
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.annotate(
+        search_rank=Greatest(
+            SearchRank(F('search_vector'), query),
+            TrigramWordSimilarity(text, 'name'),
+        ),
+    ).filter(
+        Q(search_vector=query) | Q(name__trigram_word_similar=text)
+    ).order_by('-search_rank', '-id')
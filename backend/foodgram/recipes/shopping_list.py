@@ -0,0 +1,283 @@
+"""Список покупок: суммы ингредиентов корзины и выгрузка в файл.
+
+Суммы хранятся в CartIngredientTotal и меняются в той же транзакции,
+что и корзина или ингредиенты рецепта, поэтому чтение списка зависит
+только от числа разных ингредиентов, а не от числа рецептов в корзине.
+
+Готовый файл хранится в общем кеше под версиями корзины пользователя и
+справочника ингредиентов, поэтому повторная выгрузка неизменной корзины
+обходится без агрегирующих запросов. Смена ингредиентов рецепта или его
+удаление меняет версии только тех корзин, где он лежит. PDF рисуется в
+ограниченном пуле потоков; число одновременных отрисовок ограничено для
+всех воркеров сразу через слоты в общем кеше.
+"""
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextlib import contextmanager
+from hashlib import md5
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Greatest
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .autocomplete import ingredient_index
+from .models import CartIngredientTotal, RecipeIngredient, ShoppingCart
+from .versions import Version
+
+TITLE = 'Список покупок'
+EXPORT_CACHE_TIMEOUT = 60 * 60 * 24
+CHUNK_SIZE = 64 * 1024
+
+ADD_SQL = """
+    INSERT INTO {totals} (user_id, ingredient_id, total_amount)
+    SELECT cart.user_id, item.ingredient_id, SUM(item.amount)
+    FROM {cart} cart
+    JOIN {items} item ON item.recipe_id = cart.recipe_id
+    WHERE {where}
+    GROUP BY cart.user_id, item.ingredient_id
+    ON CONFLICT (user_id, ingredient_id)
+    DO UPDATE SET total_amount = {totals}.total_amount + excluded.total_amount
+"""
+
+PDF_FONT = 'ShoppingListFont'
+PDF_MARGIN = 50
+PDF_LINE = 18
+# Столько запрос ждёт готовый PDF.
+PDF_TIMEOUT = 60
+# Слот занят не дольше этого времени, даже если воркер упал.
+PDF_SLOT_TIMEOUT = 5 * 60
+
+_pdf_pool = ThreadPoolExecutor(
+    max_workers=settings.SHOPPING_LIST_PDF_WORKERS,
+    thread_name_prefix='shopping-list-pdf',
+)
+
+
+class ExportBusy(Exception):
+    """Все слоты отрисовки PDF заняты или PDF не готов за PDF_TIMEOUT."""
+
+
+def cart_version(user_id):
+    """Версия списка покупок пользователя."""
+    return Version(f'users:{user_id}:cart:version')
+
+
+def add_to_cart_totals(recipe_id=None, user_id=None, users=None):
+    """Прибавляет ингредиенты рецептов из корзин к суммам.
+
+    Без recipe_id берутся все рецепты корзины, без user_id — корзины
+    всех пользователей, в которых лежит рецепт; users — полуинтервал
+    (start, stop) id пользователей.
+    """
+    where, params = ['TRUE'], []
+    for column, value in (('recipe_id', recipe_id), ('user_id', user_id)):
+        if value is not None:
+            where.append(f'cart.{column} = %s')
+            params.append(value)
+    if users is not None:
+        where.append('cart.user_id >= %s AND cart.user_id < %s')
+        params.extend(users)
+    sql = ADD_SQL.format(
+        totals=CartIngredientTotal._meta.db_table,
+        cart=ShoppingCart._meta.db_table,
+        items=RecipeIngredient._meta.db_table,
+        where=' AND '.join(where),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def remove_from_cart_totals(recipe_id, user_id=None):
+    """Вычитает ингредиенты рецепта из сумм корзин, где он лежит."""
+    amounts = (
+        RecipeIngredient.objects
+        .filter(recipe_id=recipe_id, ingredient_id=OuterRef('ingredient_id'))
+        .values('ingredient_id')
+        .annotate(amount=Sum('amount'))
+        .values('amount')
+    )
+    totals = CartIngredientTotal.objects.filter(
+        ingredient_id__in=RecipeIngredient.objects.filter(
+            recipe_id=recipe_id).values('ingredient_id'),
+    )
+    if user_id is None:
+        users = ShoppingCart.objects.filter(
+            recipe_id=recipe_id).values_list('user_id', flat=True)
+        totals = totals.filter(user_id__in=users)
+        # Готовые файлы этих корзин устарели; корзину одного пользователя
+        # меняют сигналы ShoppingCart.
+        for cart_user_id in users.iterator():
+            cart_version(cart_user_id).bump()
+    else:
+        totals = totals.filter(user_id=user_id)
+    totals.update(
+        total_amount=Greatest(F('total_amount') - Subquery(amounts), 0))
+    totals.filter(total_amount=0).delete()
+
+
+@contextmanager
+def recipe_ingredients_change(recipe_id):
+    """Переносит в суммы корзин изменение ингредиентов рецепта."""
+    with transaction.atomic():
+        remove_from_cart_totals(recipe_id)
+        yield
+        add_to_cart_totals(recipe_id)
+
+
+def rebuild_cart_totals(batch_size=10000):
+    """Пересобирает все суммы по корзинам, например после bulk_create.
+
+    Суммы пересобираются пачками по batch_size id пользователей, каждая
+    в своей короткой транзакции, чтобы не блокировать всю таблицу.
+    """
+    last = max(
+        model.objects.aggregate(last=Max('user_id'))['last'] or 0
+        for model in (ShoppingCart, CartIngredientTotal)
+    )
+    for start in range(0, last + 1, batch_size):
+        users = (start, start + batch_size)
+        with transaction.atomic():
+            CartIngredientTotal.objects.filter(
+                user_id__gte=start, user_id__lt=users[1]).delete()
+            add_to_cart_totals(users=users)
+
+
+def cart_totals_query(user):
+    return (
+        CartIngredientTotal.objects
+        .filter(user=user)
+        .order_by('ingredient__name')
+        .values_list('ingredient__name', 'total_amount',
+                     'ingredient__measurement_unit')
+    )
+
+
+def cart_totals(user):
+    """Суммы ингредиентов из корзины: (название, количество, единица)."""
+    return list(cart_totals_query(user))
+
+
+def text_lines(rows):
+    return ['{} - {} {}.'.format(*row) for row in rows]
+
+
+def render_txt(rows):
+    return '\n'.join([f'{TITLE}:'] + text_lines(rows)).encode()
+
+
+def render_csv(rows):
+    stream = io.StringIO()
+    writer = csv.writer(stream)
+    writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    writer.writerows(rows)
+    # BOM нужен, чтобы Excel открыл кириллицу без выбора кодировки.
+    return stream.getvalue().encode('utf-8-sig')
+
+
+def pdf_font():
+    if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT, settings.SHOPPING_LIST_PDF_FONT))
+    return PDF_FONT
+
+
+def render_pdf(rows):
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setTitle(TITLE)
+    font = pdf_font()
+    top = A4[1] - PDF_MARGIN
+    pdf.setFont(font, 16)
+    pdf.drawString(PDF_MARGIN, top, TITLE)
+    pdf.setFont(font, 12)
+    y = top - 2 * PDF_LINE
+    for line in text_lines(rows):
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, 12)
+            y = top
+        pdf.drawString(PDF_MARGIN, y, line)
+        y -= PDF_LINE
+    pdf.save()
+    return buffer.getvalue()
+
+
+def acquire_pdf_slot():
+    for slot in range(settings.SHOPPING_LIST_PDF_WORKERS):
+        key = f'shopping-list:pdf-slot:{slot}'
+        if cache.add(key, True, PDF_SLOT_TIMEOUT):
+            return key
+    raise ExportBusy
+
+
+def render_pdf_bounded(rows):
+    key = acquire_pdf_slot()
+    try:
+        future = _pdf_pool.submit(render_pdf, rows)
+    except BaseException:
+        cache.delete(key)
+        raise
+    # Слот освобождается, когда отрисовка действительно закончилась,
+    # а не когда запрос перестал её ждать.
+    future.add_done_callback(lambda _: cache.delete(key))
+    try:
+        return future.result(PDF_TIMEOUT)
+    except TimeoutError:
+        raise ExportBusy
+
+
+RENDERERS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'pdf': ('application/pdf', render_pdf_bounded),
+}
+
+
+def export_key(user, file_format, versions):
+    return 'shopping-list:{}:{}:{}'.format(
+        user.id, file_format, md5(repr(versions).encode()).hexdigest())
+
+
+def export(user, file_format):
+    """Возвращает содержимое файла, по возможности из кеша."""
+    versions = (cart_version(user.id).get(), ingredient_index.version())
+    key = export_key(user, file_format, versions)
+    content = cache.get(key)
+    if content is None:
+        content = RENDERERS[file_format][1](cart_totals(user))
+        cache.set(key, content, EXPORT_CACHE_TIMEOUT)
+    return content
+
+
+async def aexport(user, file_format):
+    """export() для асинхронных представлений.
+
+    Суммы читаются асинхронным ORM, файл рисуется в потоке.
+    """
+    versions = (
+        await cart_version(user.id).aget(), await ingredient_index.aversion())
+    key = export_key(user, file_format, versions)
+    content = await cache.aget(key)
+    if content is None:
+        rows = [row async for row in cart_totals_query(user)]
+        content = await sync_to_async(RENDERERS[file_format][1])(rows)
+        await cache.aset(key, content, EXPORT_CACHE_TIMEOUT)
+    return content
+
+
+def chunks(content):
+    for start in range(0, len(content), CHUNK_SIZE):
+        yield content[start:start + CHUNK_SIZE]
+
+
+async def achunks(content):
+    for chunk in chunks(content):
+        yield chunk
@@ -0,0 +1,107 @@
+from django.db.models import QuerySet
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from users.models import CustomUser, Follow
+
+from .autocomplete import ingredient_index
+from .images import schedule_variants
+from .memberships import record_change
+from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .reference import tag_cache
+from .search import install_search
+from .shopping_list import (add_to_cart_totals, cart_version,
+                            remove_from_cart_totals)
+from .versions import recipes_version
+
+# Поля автора в представлении рецепта.
+AUTHOR_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(**kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(**kwargs):
+    tag_cache.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, **kwargs):
+    schedule_variants(instance)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(**kwargs):
+    # Теги и ингредиенты пишутся только вместе с самим рецептом
+    # (сериализатор, админка), поэтому отдельных сигналов для них нет:
+    # они замедлили бы запись связей.
+    recipes_version.bump()
+
+
+@receiver(pre_save, sender=CustomUser)
+def user_saving(instance, update_fields=None, **kwargs):
+    """Отмечает смену полей автора, видных в рецептах.
+
+    У нового пользователя рецептов нет, а рецепты удалённого удаляются
+    каскадом со своими сигналами, поэтому версия рецептов меняется
+    только при правке этих полей.
+    """
+    instance._author_changed = False
+    fields = [
+        name for name in AUTHOR_FIELDS
+        if update_fields is None or name in update_fields
+    ]
+    if instance.pk is None or not fields:
+        return
+    stored = CustomUser.objects.filter(
+        pk=instance.pk).values_list(*fields).first()
+    instance._author_changed = stored is not None and stored != tuple(
+        getattr(instance, name) for name in fields)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_changed(instance, created, **kwargs):
+    if not created and getattr(instance, '_author_changed', False):
+        recipes_version.bump()
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Follow)
+def membership_changed(instance, **kwargs):
+    record_change(instance)
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def cart_changed(instance, **kwargs):
+    cart_version(instance.user_id).bump()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_recipe_added(instance, created, **kwargs):
+    if created:
+        add_to_cart_totals(instance.recipe_id, instance.user_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def cart_recipe_removed(instance, origin, **kwargs):
+    # Корзины удаляемого рецепта вычитает recipe_removed одним запросом,
+    # а суммы удаляемого пользователя удаляются каскадом.
+    origin = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is ShoppingCart:
+        remove_from_cart_totals(instance.recipe_id, instance.user_id)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_removed(instance, **kwargs):
+    remove_from_cart_totals(instance.id)
+
+
+@receiver(post_migrate)
+def search_installed(sender, using, **kwargs):
+    if sender.name == 'recipes':
+        install_search(using)
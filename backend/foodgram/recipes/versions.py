@@ -0,0 +1,48 @@
+"""Версии данных в общем кеше.
+
+Версия — метка времени последнего изменения. Её меняют после фиксации
+транзакции, а при потере ключа (вытеснение, очистка кеша) создаётся
+новая, более поздняя метка: кеши и валидаторы, построенные на версиях,
+в худшем случае промахиваются, но не отдают устаревшие данные.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class Version:
+
+    def __init__(self, key):
+        self.key = key
+
+    def get(self):
+        version = cache.get(self.key)
+        if version is None:
+            cache.add(self.key, time.time(), None)
+            version = cache.get(self.key)
+        return version
+
+    async def aget(self):
+        version = await cache.aget(self.key)
+        if version is None:
+            await cache.aadd(self.key, time.time(), None)
+            version = await cache.aget(self.key)
+        return version
+
+    def touch(self):
+        """Сразу ставит новую версию и возвращает её."""
+        version = time.time()
+        cache.set(self.key, version, None)
+        return version
+
+    def bump(self):
+        transaction.on_commit(self.touch)
+
+
+recipes_version = Version('recipes:version')
+
+
+def user_flags_version(user_id):
+    """Версия избранного, списка покупок и подписок пользователя."""
+    return Version(f'users:{user_id}:flags:version')
@@ -0,0 +1,9 @@
+from django.urls import include, path
+
+from api.async_views import async_routes
+from api.urls import router, urlpatterns as api_urlpatterns
+
+urlpatterns = [
+    path('api/', include(
+        [path('', include(async_routes(router.urls)))] + api_urlpatterns[1:])),
+]
@@ -0,0 +1,130 @@
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_users
+from recipes.autocomplete import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.reference import tag_cache
+from users.models import CustomUser, Follow
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+AUTHORS = 5
+RECIPES_PER_AUTHOR = 8
+INGREDIENTS = 60
+INGREDIENTS_PER_RECIPE = 6
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    token_users.clear()
+    yield
+    cache.clear()
+    token_users.clear()
+
+
+def make_user(username):
+    return CustomUser.objects.create_user(
+        email=f'{username}@foodgram.ru',
+        username=username,
+        password='foodgram-password',
+        first_name=username.capitalize(),
+        last_name='Тестов',
+    )
+
+
+@pytest.fixture
+def user():
+    return make_user('reader')
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    # Токен уже проверен и лежит в кеше, как у работающего клиента.
+    client.get('/api/users/me/')
+    return client
+
+
+@pytest.fixture
+def tags():
+    tags = Tag.objects.bulk_create(
+        Tag(name=name, slug=slug, color=color)
+        for name, slug, color in (
+            ('Завтрак', 'breakfast', Tag.ORANGE),
+            ('Обед', 'lunch', Tag.GREEN),
+            ('Ужин', 'dinner', Tag.PURPLE),
+        )
+    )
+    # Справочники в памяти прогреты, как у работающего воркера.
+    tag_cache.all()
+    return tags
+
+
+@pytest.fixture
+def ingredients():
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(INGREDIENTS)
+    )
+    ingredient_index.all()
+    return ingredients
+
+
+@pytest.fixture
+def authors():
+    return [make_user(f'author{number}') for number in range(AUTHORS)]
+
+
+@pytest.fixture
+def dataset(user, authors, tags, ingredients):
+    """Рецепты авторов с ингредиентами, избранным, покупками и подписками."""
+    recipes = []
+    for author in authors:
+        for number in range(RECIPES_PER_AUTHOR):
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'{author.username} рецепт {number}',
+                text='Описание рецепта.',
+                cooking_time=number + 1,
+            )
+            recipe.tags.set(tags[:number % len(tags) + 1])
+            offset = len(recipes)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredients[
+                        (offset + step) % len(ingredients)],
+                    amount=step + 1,
+                )
+                for step in range(INGREDIENTS_PER_RECIPE)
+            )
+            recipes.append(recipe)
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[::2]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes[::3]
+    )
+    Follow.objects.bulk_create(
+        Follow(user=user, author=author) for author in authors[::2]
+    )
+    call_command('recount', stdout=StringIO())
+    return recipes
@@ -0,0 +1,36 @@
+import tempfile
+
+from foodgram.settings import *  # noqa: F401, F403
+
+SECRET_KEY = 'foodgram-tests'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    # Реплики включаются в тестах через REPLICA_DATABASES: replica —
+    # зеркало основной базы, lagging — отдельная база, отставшая от неё.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+        'TEST': {'MIRROR': 'default'},
+    },
+    'lagging': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-media-')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Варианты фото строятся сразу: у каждого потока своя база в памяти.
+IMAGE_WORKERS = 0
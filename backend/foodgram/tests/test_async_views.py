@@ -0,0 +1,114 @@
+import json
+from asyncio import iscoroutinefunction
+
+import pytest
+from django.urls import resolve
+from rest_framework.test import APIClient
+
+from .test_query_budget import recipe_payload
+
+pytestmark = pytest.mark.django_db
+
+ASYNC_URLS = 'tests.async_urls'
+
+
+@pytest.fixture
+def async_urls(settings):
+    def use(enabled):
+        settings.ROOT_URLCONF = ASYNC_URLS if enabled else 'foodgram.urls'
+    return use
+
+
+def body(response):
+    if response.streaming:
+        return b''.join(response)
+    return response.content
+
+
+def urls(dataset, tags, ingredients):
+    return (
+        '/api/tags/',
+        f'/api/tags/{tags[0].id}/',
+        '/api/ingredients/',
+        '/api/ingredients/?name=ингредиент 1',
+        f'/api/ingredients/{ingredients[0].id}/',
+        '/api/recipes/?limit=6',
+        '/api/recipes/?limit=6&tags=lunch&tags=dinner',
+        f'/api/recipes/{dataset[0].id}/',
+    )
+
+
+def test_hot_paths_are_coroutines(async_urls):
+    async_urls(True)
+    for url in ('/api/recipes/', '/api/recipes/1/', '/api/tags/',
+                '/api/ingredients/',
+                '/api/recipes/download_shopping_cart/'):
+        assert iscoroutinefunction(resolve(url).func)
+    assert not iscoroutinefunction(resolve('/api/users/').func)
+
+
+@pytest.mark.parametrize('client_name', ('client', 'user_client'))
+def test_same_responses_as_sync_views(request, async_urls, dataset, tags,
+                                      ingredients, client_name):
+    client = request.getfixturevalue(client_name)
+    for url in urls(dataset, tags, ingredients):
+        expected = client.get(url)
+        async_urls(True)
+        # Второй раз — уже из кешей, заполненных первым.
+        for _ in range(2):
+            response = client.get(url)
+            assert response.status_code == expected.status_code, url
+            assert json.loads(body(response)) == json.loads(body(expected))
+            assert response['ETag'] == expected['ETag']
+        async_urls(False)
+
+
+def test_cached_page_without_thread_queries(async_urls, user_client, dataset,
+                                            django_assert_num_queries):
+    async_urls(True)
+    url = '/api/recipes/?limit=6'
+    user_client.get(url)
+    with django_assert_num_queries(0):
+        response = user_client.get(url)
+    assert response.status_code == 200
+    etag = response['ETag']
+    with django_assert_num_queries(0):
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+
+def test_detail_fragment_is_one_query(async_urls, client, dataset,
+                                      django_assert_num_queries):
+    async_urls(True)
+    url = f'/api/recipes/{dataset[0].id}/'
+    client.get(url)
+    with django_assert_num_queries(1):
+        response = client.get(url)
+    assert json.loads(response.content)['id'] == dataset[0].id
+
+
+@pytest.mark.filterwarnings('ignore:StreamingHttpResponse must consume')
+def test_download_streams_from_async_export(async_urls, user_client,
+                                            dataset):
+    expected = body(user_client.get(
+        '/api/recipes/download_shopping_cart/?format=csv'))
+    async_urls(True)
+    response = user_client.get(
+        '/api/recipes/download_shopping_cart/?format=csv')
+    assert response.is_async
+    assert body(response) == expected
+
+
+def test_other_requests_use_sync_views(async_urls, user_client, client,
+                                       tags, ingredients):
+    async_urls(True)
+    response = user_client.post(
+        '/api/recipes/', recipe_payload(tags, ingredients[:2]),
+        format='json')
+    assert response.status_code == 201
+    assert client.get('/api/recipes/download_shopping_cart/').status_code \
+        == 401
+    broken = APIClient()
+    broken.credentials(HTTP_AUTHORIZATION='Token')
+    assert broken.get('/api/tags/').status_code == 401
+    assert client.get('/api/recipes/0/').status_code == 404
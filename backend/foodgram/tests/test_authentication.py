@@ -0,0 +1,99 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import (CachedTokenAuthentication, cache_key,
+                                cached_user, token_users)
+
+pytestmark = pytest.mark.django_db
+
+ME = '/api/users/me/'
+
+
+def test_cached_token_needs_no_query(user_client, user,
+                                     django_assert_num_queries):
+    key = Token.objects.get(user=user).key
+    token_users.clear()
+    # Сначала из общего кеша, затем из памяти процесса.
+    with django_assert_num_queries(0):
+        for _ in range(2):
+            authenticated, token = (
+                CachedTokenAuthentication().authenticate_credentials(key))
+            assert authenticated == user
+            assert token.key == key
+
+
+def test_unknown_token_rejected(user_client):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION='Token unknown')
+    assert client.get(ME).status_code == 401
+
+
+def test_logout_invalidates_token(user_client,
+                                  django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post('/api/auth/token/logout/')
+    assert response.status_code == 204
+    assert user_client.get(ME).status_code == 401
+
+
+def test_user_delete_invalidates_token(user_client, user):
+    user.delete()
+    assert user_client.get(ME).status_code == 401
+
+
+def test_password_change_drops_cached_user(user_client, user):
+    key = Token.objects.get(user=user).key
+    response = user_client.post('/api/users/set_password/', {
+        'current_password': 'foodgram-password',
+        'new_password': 'other-foodgram-password',
+    })
+    assert response.status_code == 204
+    assert cached_user(key) is None
+
+
+def test_profile_change_is_visible(user_client, user):
+    user.first_name = 'Другое'
+    user.save()
+    assert user_client.get(ME).data['first_name'] == 'Другое'
+
+
+def test_revocation_reaches_other_workers(user_client, user):
+    key = Token.objects.get(user=user).key
+    entry = token_users.get(cache_key(key))
+    assert entry is not None
+    Token.objects.filter(key=key).delete()
+    # LRU другого воркера ещё хранит запись, но её версия устарела.
+    token_users.set(cache_key(key), entry)
+    assert cached_user(key) is None
+    assert user_client.get(ME).status_code == 401
+
+
+def test_password_hash_is_not_cached(user_client, user):
+    key = Token.objects.get(user=user).key
+    assert user.password not in repr(cache.get(cache_key(key)))
+    cached = cached_user(key)
+    assert cached.username == user.username
+    assert 'password' in cached.get_deferred_fields()
+
+
+def test_logout_during_lookup_is_not_cached(
+        monkeypatch, user_client, user, django_capture_on_commit_callbacks):
+    cache.clear()
+    token_users.clear()
+    lookup = TokenAuthentication.authenticate_credentials
+
+    def logout_meanwhile(self, key):
+        found = lookup(self, key)
+        # Выход другого запроса между чтением токена и записью в кеш.
+        with django_capture_on_commit_callbacks(execute=True):
+            Token.objects.filter(key=key).delete()
+        return found
+
+    monkeypatch.setattr(
+        TokenAuthentication, 'authenticate_credentials', logout_meanwhile)
+    user_client.get(ME)
+    monkeypatch.undo()
+    assert user_client.get(ME).status_code != 200
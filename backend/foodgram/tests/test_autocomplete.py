@@ -0,0 +1,53 @@
+import pytest
+from django.core.cache import cache
+
+from recipes.autocomplete import ingredient_index
+from recipes.models import Ingredient
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def catalog():
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='г')
+        for name in ('сахарная пудра', 'Сахар', 'ванильный сахар',
+                     'соль', 'сахар тростниковый')
+    )
+
+
+def names(items):
+    return [item['name'] for item in items]
+
+
+def test_exact_then_prefix_then_substring(catalog):
+    assert names(ingredient_index.search('САХАР')) == [
+        'Сахар', 'сахар тростниковый', 'сахарная пудра', 'ванильный сахар',
+    ]
+
+
+def test_search_limit(catalog):
+    assert names(ingredient_index.search('сах', limit=2)) == [
+        'Сахар', 'сахар тростниковый',
+    ]
+
+
+def test_index_rebuilds_on_version_change(catalog,
+                                          django_assert_num_queries):
+    ingredient_index.search('соль')
+    with django_assert_num_queries(0):
+        ingredient_index.search('соль')
+    Ingredient.objects.filter(name='соль').update(name='соль морская')
+    cache.set(ingredient_index.version_key, 'changed')
+    assert names(ingredient_index.search('соль')) == ['соль морская']
+
+
+def test_endpoint_serves_from_index(client, catalog,
+                                    django_assert_num_queries):
+    client.get('/api/ingredients/')
+    with django_assert_num_queries(0):
+        response = client.get('/api/ingredients/?name=соль')
+    assert response.data == [
+        {'id': response.data[0]['id'], 'name': 'соль',
+         'measurement_unit': 'г'},
+    ]
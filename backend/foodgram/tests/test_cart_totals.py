@@ -0,0 +1,95 @@
+from collections import defaultdict
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import CartIngredientTotal, RecipeIngredient, ShoppingCart
+from recipes.shopping_list import rebuild_cart_totals
+
+from .conftest import IMAGE
+
+pytestmark = pytest.mark.django_db
+
+URL = '/api/recipes/shopping_cart_summary/'
+
+
+def expected_totals(user):
+    totals = defaultdict(int)
+    for item in RecipeIngredient.objects.filter(recipe__cart__user=user):
+        totals[item.ingredient_id] += item.amount
+    return dict(totals)
+
+
+def stored_totals(user):
+    return dict(CartIngredientTotal.objects.filter(
+        user=user).values_list('ingredient_id', 'total_amount'))
+
+
+def test_summary_matches_cart(user_client, user, dataset):
+    response = user_client.get(URL)
+    assert response.status_code == 200
+    assert {row['id']: row['amount'] for row in response.data} == (
+        expected_totals(user))
+    names = [row['name'] for row in response.data]
+    assert names == sorted(names)
+
+
+def test_summary_does_not_depend_on_cart_size(user_client, dataset,
+                                              django_assert_num_queries):
+    # Токен берётся из кеша, остаётся чтение сумм.
+    with django_assert_num_queries(1):
+        user_client.get(URL)
+
+
+def test_cart_add_and_remove(user_client, user, dataset):
+    recipe = next(
+        recipe for recipe in dataset
+        if not ShoppingCart.objects.filter(user=user, recipe=recipe).exists())
+    url = f'/api/recipes/{recipe.id}/shopping_cart/'
+    assert user_client.post(url).status_code == 201
+    assert stored_totals(user) == expected_totals(user)
+    assert user_client.delete(url).status_code == 204
+    assert stored_totals(user) == expected_totals(user)
+
+
+def test_recipe_ingredients_change(client, user, authors, dataset, tags,
+                                   ingredients):
+    recipe = ShoppingCart.objects.filter(user=user).first().recipe
+    client.force_authenticate(recipe.author)
+    response = client.patch(f'/api/recipes/{recipe.id}/', {
+        'name': recipe.name, 'text': recipe.text, 'image': IMAGE,
+        'cooking_time': 5, 'tags': [tags[0].id],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 7}
+            for ingredient in ingredients[-3:]
+        ],
+    }, format='json')
+    assert response.status_code == 200
+    assert stored_totals(user) == expected_totals(user)
+
+
+def test_recipe_delete(client, user, dataset):
+    recipe = ShoppingCart.objects.filter(user=user).first().recipe
+    client.force_authenticate(recipe.author)
+    assert client.delete(f'/api/recipes/{recipe.id}/').status_code == 204
+    assert stored_totals(user) == expected_totals(user)
+
+
+def test_recount_rebuilds_totals(user, dataset):
+    CartIngredientTotal.objects.all().delete()
+    call_command('recount', stdout=StringIO())
+    assert stored_totals(user) == expected_totals(user)
+
+
+def test_rebuild_in_user_batches(user, authors, dataset):
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=authors[0], recipe=recipe) for recipe in dataset[:3])
+    CartIngredientTotal.objects.all().delete()
+    # Сумма без корзины должна исчезнуть.
+    CartIngredientTotal.objects.create(
+        user=authors[1], ingredient_id=dataset[0].ingredients.first().id,
+        total_amount=5)
+    rebuild_cart_totals(batch_size=1)
+    for reader in (user, authors[0], authors[1]):
+        assert stored_totals(reader) == expected_totals(reader)
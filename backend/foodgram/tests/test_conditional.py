@@ -0,0 +1,87 @@
+import pytest
+
+from recipes.models import Favorite
+
+pytestmark = pytest.mark.django_db
+
+
+def revalidate(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return client.get(url, HTTP_IF_NONE_MATCH=response['ETag']), response
+
+
+@pytest.mark.parametrize('url', ('/api/tags/', '/api/ingredients/'))
+def test_reference_not_modified_without_queries(client, dataset, url,
+                                                django_assert_num_queries):
+    etag = client.get(url)['ETag']
+    with django_assert_num_queries(0):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+
+
+def test_recipe_list_not_modified(user_client, dataset,
+                                  django_assert_num_queries):
+    url = '/api/recipes/?limit=6'
+    etag = user_client.get(url)['ETag']
+    # Токен берётся из кеша, запросов к базе нет.
+    with django_assert_num_queries(0):
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+
+def test_recipe_list_etag_depends_on_query(client, dataset):
+    first = client.get('/api/recipes/?limit=6')['ETag']
+    assert client.get('/api/recipes/?limit=7')['ETag'] != first
+
+
+def test_favorite_changes_only_own_etag(client, user_client, user, dataset,
+                                        django_capture_on_commit_callbacks):
+    url = '/api/recipes/'
+    anonymous = client.get(url)['ETag']
+    own = user_client.get(url)['ETag']
+    with django_capture_on_commit_callbacks(execute=True):
+        Favorite.objects.create(user=user, recipe=dataset[1])
+    assert client.get(url)['ETag'] == anonymous
+    response = user_client.get(url, HTTP_IF_NONE_MATCH=own)
+    assert response.status_code == 200
+    assert response['ETag'] != own
+
+
+def test_recipe_edit_changes_detail_etag(client, dataset):
+    url = f'/api/recipes/{dataset[0].id}/'
+    response, first = revalidate(client, url)
+    assert response.status_code == 304
+    assert first['Last-Modified']
+    dataset[0].name = 'Другое название'
+    dataset[0].save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert response.status_code == 200
+    assert response.data['name'] == 'Другое название'
+
+
+def test_missing_recipe_has_no_etag(client, dataset):
+    response = client.get('/api/recipes/0/')
+    assert response.status_code == 404
+    assert 'ETag' not in response
+
+
+def test_only_author_fields_change_list_etag(
+        client, authors, dataset, django_capture_on_commit_callbacks):
+    url = '/api/recipes/'
+    etag = client.get(url)['ETag']
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post('/api/users/', {
+            'email': 'new@foodgram.ru', 'username': 'new',
+            'first_name': 'Новый', 'last_name': 'Пользователь',
+            'password': 'foodgram-password',
+        })
+        assert response.status_code == 201
+        authors[0].set_password('other-foodgram-password')
+        authors[0].save()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    with django_capture_on_commit_callbacks(execute=True):
+        authors[0].first_name = 'Другое'
+        authors[0].save()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
@@ -0,0 +1,57 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Recipe
+from users.models import CustomUser
+
+from .conftest import IMAGE
+
+pytestmark = pytest.mark.django_db
+
+
+def test_counters_follow_api_writes(user_client, user, authors, tags,
+                                    ingredients):
+    author = authors[0]
+    response = user_client.post('/api/recipes/', {
+        'name': 'Рецепт', 'text': 'Текст.', 'image': IMAGE,
+        'cooking_time': 5, 'tags': [tags[0].id],
+        'ingredients': [{'id': ingredients[0].id, 'amount': 1}],
+    }, format='json')
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    user.refresh_from_db()
+    assert user.recipes_count == 1
+
+    recipe.author = author
+    recipe.save()
+    for action in ('favorite', 'shopping_cart'):
+        user_client.post(f'/api/recipes/{recipe.id}/{action}/')
+    user_client.post(f'/api/users/{author.id}/subscribe/')
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    assert (recipe.favorites_count, recipe.in_carts_count) == (1, 1)
+    assert author.followers_count == 1
+
+    for action in ('favorite', 'shopping_cart'):
+        user_client.delete(f'/api/recipes/{recipe.id}/{action}/')
+        user_client.delete(f'/api/recipes/{recipe.id}/{action}/')
+    user_client.delete(f'/api/users/{author.id}/subscribe/')
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    assert (recipe.favorites_count, recipe.in_carts_count) == (0, 0)
+    assert author.followers_count == 0
+
+
+def test_recount_repairs_drift(dataset, authors):
+    Recipe.objects.update(favorites_count=100)
+    CustomUser.objects.update(recipes_count=0)
+    output = StringIO()
+    call_command('recount', batch_size=7, stdout=output)
+    recipe = Recipe.objects.get(pk=dataset[0].pk)
+    assert recipe.favorites_count == recipe.favorites.count() == 1
+    assert recipe.in_carts_count == recipe.cart.count() == 1
+    author = CustomUser.objects.get(pk=authors[0].pk)
+    assert author.recipes_count == author.recipes.count()
+    assert author.followers_count == author.following.count() == 1
+    assert f'favorites_count: исправлено {len(dataset)}.' in output.getvalue()
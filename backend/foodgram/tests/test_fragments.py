@@ -0,0 +1,94 @@
+import pytest
+
+from api.views import RecipeViewSet
+from recipes.models import Ingredient, Recipe
+
+pytestmark = pytest.mark.django_db
+
+CURSOR = '/api/recipes/?pagination=cursor&limit={}'
+
+
+def recipe_in(response, recipe_id):
+    return next(
+        recipe for recipe in response.data['results']
+        if recipe['id'] == recipe_id)
+
+
+def test_other_page_assembled_from_fragments(client, dataset,
+                                             django_assert_num_queries):
+    client.get(CURSOR.format(20))
+    # Другая страница: только выборка версий, представления из кеша.
+    with django_assert_num_queries(1):
+        response = client.get(CURSOR.format(10))
+    assert len(response.data['results']) == 10
+
+
+def test_user_flags_not_shared(client, user_client, user, dataset):
+    url = '/api/recipes/?is_favorited=1&limit=100'
+    favorited = {
+        recipe['id'] for recipe in user_client.get(url).data['results']}
+    assert favorited == {recipe.id for recipe in dataset[::2]}
+    response = client.get(CURSOR.format(100))
+    for recipe in response.data['results']:
+        assert recipe['is_favorited'] is False
+        assert recipe['is_in_shopping_cart'] is False
+        assert recipe['author']['is_subscribed'] is False
+
+
+def test_detail_fragment_gets_user_flags(client, user_client, dataset):
+    url = f'/api/recipes/{dataset[0].id}/'
+    assert client.get(url).data['is_favorited'] is False
+    response = user_client.get(url)
+    assert response.data['is_favorited'] is True
+    assert response.data['is_in_shopping_cart'] is True
+    assert response.data['author']['is_subscribed'] is True
+
+
+@pytest.mark.parametrize('change', ('recipe', 'author', 'tag', 'ingredient'))
+def test_writes_replace_fragment(client, dataset, change,
+                                 django_capture_on_commit_callbacks):
+    recipe = Recipe.objects.get(pk=dataset[-1].pk)
+    client.get(CURSOR.format(100))
+    with django_capture_on_commit_callbacks(execute=True):
+        if change == 'recipe':
+            recipe.name = 'Новое название'
+            recipe.save()
+        elif change == 'author':
+            recipe.author.first_name = 'Новое имя'
+            recipe.author.save()
+        elif change == 'tag':
+            tag = recipe.tags.first()
+            tag.name = 'Новый тег'
+            tag.save()
+        else:
+            ingredient = Ingredient.objects.get(
+                pk=recipe.recipe_ingredient.first().ingredient_id)
+            ingredient.name = 'новый ингредиент'
+            ingredient.save()
+    shown = recipe_in(client.get(CURSOR.format(100)), recipe.id)
+    assert {
+        'recipe': lambda: shown['name'] == 'Новое название',
+        'author': lambda: shown['author']['first_name'] == 'Новое имя',
+        'tag': lambda: 'Новый тег' in [tag['name'] for tag in shown['tags']],
+        'ingredient': lambda: 'новый ингредиент' in [
+            item['name'] for item in shown['ingredients']],
+    }[change]()
+
+
+def test_serializer_fragments(settings, client, dataset):
+    settings.RECIPE_SQL_JSON = False
+    response = client.get(CURSOR.format(5))
+    assert [recipe['id'] for recipe in response.data['results']] == [
+        recipe.id for recipe in reversed(dataset[-5:])]
+
+
+def test_recipe_deleted_during_retrieve(monkeypatch, client, dataset):
+    recipe = dataset[0]
+    build = RecipeViewSet.build_fragments
+
+    def delete_then_build(view, ids, variant=None):
+        Recipe.objects.filter(pk=recipe.pk).delete()
+        return build(view, ids, variant)
+
+    monkeypatch.setattr(RecipeViewSet, 'build_fragments', delete_then_build)
+    assert client.get(f'/api/recipes/{recipe.id}/').status_code == 404
@@ -0,0 +1,57 @@
+import pytest
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from recipes.images import VARIANTS
+from recipes.models import Recipe
+
+from .test_query_budget import recipe_payload
+
+pytestmark = pytest.mark.django_db
+
+
+def create_recipe(client, tags, ingredients):
+    response = client.post(
+        '/api/recipes/', recipe_payload(tags, ingredients[:3]), format='json')
+    assert response.status_code == 201
+    return Recipe.objects.get(pk=response.data['id'])
+
+
+def test_original_served_until_variants_exist(user_client, tags,
+                                              ingredients):
+    recipe = create_recipe(user_client, tags, ingredients)
+    assert recipe.image_variants == {}
+    response = user_client.get('/api/recipes/')
+    assert response.data['results'][0]['image'].endswith(recipe.image.url)
+
+
+def test_variants_built_after_commit(user_client, tags, ingredients,
+                                     django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = create_recipe(user_client, tags, ingredients)
+    recipe.refresh_from_db()
+    assert recipe.image_variants['source'] == recipe.image.name
+    for variant, size in VARIANTS.items():
+        with default_storage.open(recipe.image_variants[variant]) as file:
+            image = Image.open(file)
+            assert image.size == size
+            assert 'exif' not in image.info
+    listed = user_client.get('/api/recipes/').data['results'][0]
+    assert listed['image'].endswith(
+        default_storage.url(recipe.image_variants['card']))
+    detail = user_client.get(f'/api/recipes/{recipe.id}/').data
+    assert detail['image'].endswith(recipe.image.url)
+
+
+def test_variant_names_follow_content(user_client, tags, ingredients,
+                                      django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        first = create_recipe(user_client, tags, ingredients)
+    payload = recipe_payload(tags, ingredients[:3], 'Второй рецепт')
+    with django_capture_on_commit_callbacks(execute=True):
+        second = Recipe.objects.get(pk=user_client.post(
+            '/api/recipes/', payload, format='json').data['id'])
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert first.image.name != second.image.name
+    assert first.image_variants['card'] == second.image_variants['card']
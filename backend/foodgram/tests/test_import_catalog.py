@@ -0,0 +1,76 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Ingredient, Tag
+
+pytestmark = pytest.mark.django_db
+
+
+def run_import(path, **options):
+    output = StringIO()
+    call_command('import_catalog', str(path), stdout=output, **options)
+    return output.getvalue()
+
+
+@pytest.fixture
+def catalog_csv(tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('соль,г\nсахар,г\nсоль,г\nбитая строка\n',
+                    encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def fixture_json(tmp_path):
+    path = tmp_path / 'catalog.json'
+    path.write_text(json.dumps([
+        {'model': 'recipes.tag', 'pk': 1,
+         'fields': {'name': 'завтрак', 'color': '#E26C2D',
+                    'slug': 'breakfast'}},
+        {'model': 'recipes.ingredient', 'pk': 1,
+         'fields': {'name': 'соль', 'measurement_unit': 'г'}},
+        {'name': 'перец', 'measurement_unit': 'г'},
+    ]), encoding='utf-8')
+    return path
+
+
+def test_csv_import_counts(catalog_csv):
+    output = run_import(catalog_csv, batch_size=2)
+    assert 'Добавлено: 2, обновлено: 0, пропущено: 2.' in output
+    assert Ingredient.objects.count() == 2
+    output = run_import(catalog_csv)
+    assert 'Добавлено: 0, обновлено: 0, пропущено: 4.' in output
+
+
+def test_json_import_upserts_tags(fixture_json):
+    Tag.objects.create(name='утро', color='#49B64E', slug='breakfast')
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    output = run_import(fixture_json)
+    assert 'Добавлено: 1, обновлено: 1, пропущено: 1.' in output
+    tag = Tag.objects.get(slug='breakfast')
+    assert (tag.name, tag.color) == ('завтрак', '#E26C2D')
+
+
+def test_dry_run_does_not_write(fixture_json):
+    output = run_import(fixture_json, dry_run=True)
+    assert output.startswith('Проверка без записи.')
+    assert not Ingredient.objects.exists()
+    assert not Tag.objects.exists()
+
+
+def test_tag_name_and_color_conflicts_are_skipped(tmp_path):
+    Tag.objects.create(name='завтрак', color='#E26C2D', slug='breakfast')
+    path = tmp_path / 'tags.json'
+    path.write_text(json.dumps([
+        {'name': 'завтрак', 'color': '#49B64E', 'slug': 'morning'},
+        {'name': 'обед', 'color': '#E26C2D', 'slug': 'lunch'},
+        {'name': 'ужин', 'color': '#8775D2', 'slug': 'dinner'},
+        {'name': 'ужин', 'color': '#49B64E', 'slug': 'supper'},
+    ]), encoding='utf-8')
+    output = run_import(path)
+    assert 'Добавлено: 1, обновлено: 0, пропущено: 3.' in output
+    assert set(Tag.objects.values_list('slug', flat=True)) == {
+        'breakfast', 'dinner'}
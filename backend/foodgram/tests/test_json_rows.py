@@ -0,0 +1,73 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import RecipeListSerializer
+from recipes.models import Recipe
+
+from .test_images import create_recipe
+
+pytestmark = pytest.mark.django_db
+
+
+def serialized(user, queryset, **context):
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = user
+    return JSONRenderer().render(RecipeListSerializer(
+        queryset, many=True, context={'request': request, **context}).data)
+
+
+@pytest.fixture
+def odd_recipes(user, tags, ingredients, user_client,
+                django_capture_on_commit_callbacks):
+    """Фото с вариантами, пустые теги и ингредиенты, спецсимволы."""
+    with django_capture_on_commit_callbacks(execute=True):
+        with_variants = create_recipe(user_client, tags, ingredients)
+    Recipe.objects.create(
+        author=user,
+        name='Кавычки "и" \\ слеши',
+        text='Строки\nс табуляцией\t и эмодзи 🍲',
+        cooking_time=1,
+    )
+    return with_variants
+
+
+@pytest.mark.parametrize('client_name', ('client', 'user_client'))
+def test_list_matches_serializer(request, user, dataset, odd_recipes,
+                                 client_name):
+    client = request.getfixturevalue(client_name)
+    user = user if client_name == 'user_client' else AnonymousUser()
+    response = client.get('/api/recipes/?limit=100')
+    expected = serialized(
+        user, Recipe.objects.with_related(), image_variant='card')
+    assert JSONRenderer().render(response.data['results']) == expected
+
+
+@pytest.mark.parametrize('client_name', ('client', 'user_client'))
+def test_detail_matches_serializer(request, user, dataset, odd_recipes,
+                                   client_name):
+    client = request.getfixturevalue(client_name)
+    user = user if client_name == 'user_client' else AnonymousUser()
+    for recipe in (dataset[0], odd_recipes, Recipe.objects.first()):
+        response = client.get(f'/api/recipes/{recipe.id}/')
+        expected = serialized(
+            user, Recipe.objects.with_related().filter(pk=recipe.pk))
+        assert JSONRenderer().render([response.data]) == expected
+
+
+def test_cold_list_page_queries(client, dataset, django_assert_num_queries):
+    # Версии рецептов страницы и сборка их представлений.
+    with django_assert_num_queries(2):
+        response = client.get('/api/recipes/?pagination=cursor&limit=20')
+    assert len(response.data['results']) == 20
+
+
+def test_serializer_path_when_disabled(settings, user_client, dataset):
+    url = '/api/recipes/?limit=10&page=2'
+    fast = user_client.get(url).data
+    settings.RECIPE_SQL_JSON = False
+    cache.clear()
+    assert user_client.get(url).data == fast
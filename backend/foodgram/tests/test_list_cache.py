@@ -0,0 +1,89 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.list_cache import cache_key
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow
+
+pytestmark = pytest.mark.django_db
+
+URL = '/api/recipes/?limit=20'
+
+
+def names(response):
+    return [recipe['name'] for recipe in response.data['results']]
+
+
+def test_user_flags_overlaid(client, user_client, user, dataset):
+    client.get(URL)
+    results = user_client.get(URL).data['results']
+    favorited = set(Favorite.objects.filter(
+        user=user).values_list('recipe_id', flat=True))
+    in_cart = set(ShoppingCart.objects.filter(
+        user=user).values_list('recipe_id', flat=True))
+    subscribed = set(Follow.objects.filter(
+        user=user).values_list('author_id', flat=True))
+    assert any(recipe['is_favorited'] for recipe in results)
+    for recipe in results:
+        assert recipe['is_favorited'] == (recipe['id'] in favorited)
+        assert recipe['is_in_shopping_cart'] == (recipe['id'] in in_cart)
+        assert recipe['author']['is_subscribed'] == (
+            recipe['author']['id'] in subscribed)
+    assert not any(
+        recipe['is_favorited'] for recipe in client.get(URL).data['results'])
+
+
+def test_user_filters_bypass_cache(user_client, user, dataset):
+    user_client.get(URL)
+    response = user_client.get(URL + '&is_favorited=1')
+    assert {recipe['id'] for recipe in response.data['results']} == set(
+        Favorite.objects.filter(user=user).values_list('recipe_id',
+                                                       flat=True)[:20])
+
+
+def test_recipe_write_invalidates(client, dataset,
+                                  django_capture_on_commit_callbacks):
+    client.get(URL)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = Recipe.objects.get(pk=dataset[-1].pk)
+        recipe.name = 'Переименованный рецепт'
+        recipe.save()
+    assert 'Переименованный рецепт' in names(client.get(URL))
+
+
+def test_stale_page_served_while_rebuilding(
+        client, dataset, django_capture_on_commit_callbacks):
+    client.get(URL)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = Recipe.objects.get(pk=dataset[-1].pk)
+        recipe.name = 'Переименованный рецепт'
+        recipe.save()
+    # Другой воркер уже пересобирает страницу — отдаётся прежняя.
+    lock = cache_key(Request(APIRequestFactory().get(URL))) + ':rebuild'
+    cache.add(lock, True)
+    assert 'Переименованный рецепт' not in names(client.get(URL))
+    cache.delete(lock)
+    assert 'Переименованный рецепт' in names(client.get(URL))
+
+
+def test_stale_page_keeps_its_own_validators(
+        client, dataset, django_capture_on_commit_callbacks):
+    old = client.get(URL)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = Recipe.objects.get(pk=dataset[-1].pk)
+        recipe.name = 'Переименованный рецепт'
+        recipe.save()
+    lock = cache_key(Request(APIRequestFactory().get(URL))) + ':rebuild'
+    cache.add(lock, True)
+    stale = client.get(URL)
+    assert stale['ETag'] == old['ETag']
+    assert stale['Last-Modified'] == old['Last-Modified']
+    assert client.get(
+        URL, HTTP_IF_NONE_MATCH=old['ETag']).status_code == 304
+    cache.delete(lock)
+    fresh = client.get(URL, HTTP_IF_NONE_MATCH=old['ETag'])
+    assert fresh.status_code == 200
+    assert fresh['ETag'] != old['ETag']
+    assert 'Переименованный рецепт' in names(fresh)
@@ -0,0 +1,79 @@
+import pytest
+
+from recipes.memberships import IdSet, memberships, reset_memberships
+from recipes.models import Favorite, Recipe
+
+pytestmark = pytest.mark.django_db
+
+
+def test_id_set():
+    ids = IdSet((5, 1, 3, 3))
+    assert list(ids) == [1, 3, 5]
+    assert 3 in ids and 2 not in ids and 0 not in ids and 6 not in ids
+
+
+def test_loaded_once(user, dataset, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        sets = memberships(user.id)
+    with django_assert_num_queries(0):
+        assert memberships(user.id)['favorites'].ids == sets['favorites'].ids
+    assert set(sets['favorites']) == {recipe.id for recipe in dataset[::2]}
+    assert set(sets['cart']) == {recipe.id for recipe in dataset[::3]}
+
+
+def test_actions_reload_entry(user_client, user, authors, dataset,
+                              django_capture_on_commit_callbacks,
+                              django_assert_num_queries):
+    memberships(user.id)
+    recipe, author = dataset[1], authors[1]
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.post(f'/api/recipes/{recipe.id}/favorite/')
+        user_client.delete(f'/api/recipes/{dataset[0].id}/shopping_cart/')
+        user_client.post(f'/api/users/{author.id}/subscribe/')
+    # Запись не правится на месте, а перечитывается одним запросом.
+    with django_assert_num_queries(1):
+        sets = memberships(user.id)
+    assert recipe.id in sets['favorites']
+    assert dataset[0].id not in sets['cart']
+    assert author.id in sets['follows']
+
+
+def test_changes_are_not_lost(user, dataset,
+                              django_capture_on_commit_callbacks):
+    memberships(user.id)
+    with django_capture_on_commit_callbacks(execute=True):
+        Favorite.objects.create(user=user, recipe=dataset[1])
+    with django_capture_on_commit_callbacks(execute=True):
+        Favorite.objects.create(user=user, recipe=dataset[3])
+    favorites = memberships(user.id)['favorites']
+    assert dataset[1].id in favorites and dataset[3].id in favorites
+
+
+def test_heavy_user_flags_without_queries(user_client, user, authors,
+                                          django_assert_num_queries):
+    Recipe.objects.bulk_create(
+        Recipe(author=authors[0], name=f'Рецепт {number}', text='Текст.',
+               cooking_time=1)
+        for number in range(2000)
+    )
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe)
+        for recipe in Recipe.objects.all()[::2])
+    # Массовая запись в обход сигналов, как после recount.
+    reset_memberships()
+    url = '/api/recipes/?pagination=cursor&limit=6'
+    user_client.get(url)
+    with django_assert_num_queries(0):
+        response = user_client.get(url)
+    assert [recipe['is_favorited'] for recipe in response.data['results']] == [
+        True, False] * 3
+
+
+def test_filters_use_sets(user_client, dataset):
+    url = '/api/recipes/?limit=100&is_favorited={}'
+    favorited = user_client.get(url.format(1)).data['results']
+    other = user_client.get(url.format(0)).data['results']
+    assert {recipe['id'] for recipe in favorited} == {
+        recipe.id for recipe in dataset[::2]}
+    assert not any(recipe['is_favorited'] for recipe in other)
+    assert len(favorited) + len(other) == len(dataset)
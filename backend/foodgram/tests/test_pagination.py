@@ -0,0 +1,69 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.pagination import CustomPageNumberPagination, FeedCursorPagination
+
+pytestmark = pytest.mark.django_db
+
+
+def walk(client, url):
+    """Проходит ленту по ссылкам next, считая запросы на каждую страницу."""
+    pages = []
+    while url:
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == 200
+        pages.append((response.data, len(context)))
+        url = response.data['next']
+    return pages
+
+
+def test_cursor_feed_walks_all_recipes(client, dataset):
+    pages = walk(client, '/api/recipes/?pagination=cursor&limit=7')
+    ids = [recipe['id'] for page, _ in pages for recipe in page['results']]
+    assert ids == sorted((recipe.id for recipe in dataset), reverse=True)
+    assert 'count' not in pages[0][0]
+    assert len({queries for _, queries in pages}) == 1
+
+
+def test_cursor_feed_keeps_filters(user_client, dataset):
+    pages = walk(
+        user_client, '/api/recipes/?pagination=cursor&limit=2&is_favorited=1')
+    results = [recipe for page, _ in pages for recipe in page['results']]
+    assert len(results) == len(dataset[::2])
+    assert all(recipe['is_favorited'] for recipe in results)
+
+
+def test_cursor_feed_cached_count(client, dataset, django_assert_num_queries):
+    url = '/api/recipes/?pagination=cursor&with_count=1'
+    assert client.get(url).data['count'] == len(dataset)
+    # Другая страница той же выборки: count берётся из кеша, рецепты
+    # приходят одним запросом.
+    with django_assert_num_queries(1):
+        assert client.get(url + '&limit=2').data['count'] == len(dataset)
+
+
+def test_subscriptions_cursor_feed(user_client, authors, dataset):
+    pages = walk(user_client, '/api/users/subscriptions/?pagination=cursor'
+                              '&limit=1&recipes_limit=1')
+    ids = [author['id'] for page, _ in pages for author in page['results']]
+    assert ids == [author.id for author in reversed(authors[::2])]
+
+
+@pytest.mark.parametrize('mode, paginator', (
+    ('', CustomPageNumberPagination),
+    ('&pagination=cursor', FeedCursorPagination),
+))
+def test_page_size_is_capped(client, dataset, monkeypatch, mode, paginator):
+    monkeypatch.setattr(paginator, 'max_page_size', 5)
+    response = client.get(f'/api/recipes/?limit=1000{mode}')
+    assert len(response.data['results']) == 5
+
+
+def test_cursor_feed_rejects_search(client, dataset):
+    response = client.get('/api/recipes/?pagination=cursor&search=рецепт')
+    assert response.status_code == 400
+    assert 'pagination' in response.data
+    response = client.get('/api/recipes/?search=рецепт')
+    assert response.status_code == 200
@@ -0,0 +1,339 @@
+"""Бюджет SQL-запросов для каждого эндпоинта API.
+
+Каждый запрос ограничен явным максимумом, а для списков дополнительно
+проверяется, что число запросов не растёт вместе с размером страницы,
+корзины или рецепта.
+"""
+import re
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow
+
+from .conftest import IMAGE, make_user
+
+INGREDIENT_WRITE = re.compile(
+    r'(INSERT|UPDATE|DELETE)( INTO| FROM)? "recipes_recipeingredient"')
+
+pytestmark = pytest.mark.django_db
+
+
+def count_queries(request):
+    with CaptureQueriesContext(connection) as context:
+        response = request()
+    return response, len(context)
+
+
+def recipe_payload(tags, ingredients, name='Новый рецепт'):
+    return {
+        'name': name,
+        'text': 'Описание нового рецепта.',
+        'image': IMAGE,
+        'cooking_time': 15,
+        'tags': [tag.id for tag in tags],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 10} for ingredient in ingredients
+        ],
+    }
+
+
+# Первая выборка страницы: для пользователя она собирается анонимной и
+# дополняется его флагами.
+@pytest.mark.parametrize('client_name, budget', (
+    ('client', 4),
+    ('user_client', 8),
+))
+@pytest.mark.parametrize('query, lookups', (
+    ('', 0),
+    ('?tags=breakfast&tags=dinner', 1),
+    ('?author={author}', 1),
+    ('?is_favorited=1', 0),
+    ('?is_in_shopping_cart=1', 0),
+    ('?search=рецепт&tags=lunch', 1),
+))
+def test_recipe_list(request, dataset, authors, client_name, budget, query,
+                     lookups, django_assert_max_num_queries):
+    client = request.getfixturevalue(client_name)
+    url = '/api/recipes/' + query.format(author=authors[0].id)
+    with django_assert_max_num_queries(budget + lookups):
+        response = client.get(url)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('client_name, budget', (
+    ('client', 0),
+    ('user_client', 0),
+))
+def test_recipe_list_cached(request, dataset, client_name, budget,
+                            django_assert_num_queries):
+    client = request.getfixturevalue(client_name)
+    client.get('/api/recipes/?tags=lunch&tags=dinner')
+    with django_assert_num_queries(budget):
+        response = client.get('/api/recipes/?tags=dinner&tags=lunch')
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('client_name', ('client', 'user_client'))
+def test_recipe_list_does_not_grow_with_page_size(request, dataset,
+                                                  client_name):
+    client = request.getfixturevalue(client_name)
+    _, single = count_queries(lambda: client.get('/api/recipes/?limit=1'))
+    response, full = count_queries(
+        lambda: client.get(f'/api/recipes/?limit={len(dataset)}'))
+    assert len(response.data['results']) == len(dataset)
+    assert full == single
+
+
+@pytest.mark.parametrize('client_name, budget', (
+    ('client', 4),
+    ('user_client', 6),
+))
+def test_recipe_detail(request, dataset, client_name, budget,
+                       django_assert_max_num_queries):
+    client = request.getfixturevalue(client_name)
+    with django_assert_max_num_queries(budget):
+        response = client.get(f'/api/recipes/{dataset[0].id}/')
+    assert response.status_code == 200
+
+
+def test_recipe_create(user_client, tags, ingredients,
+                       django_assert_max_num_queries):
+    with django_assert_max_num_queries(16):
+        response = user_client.post(
+            '/api/recipes/', recipe_payload(tags, ingredients[:6]),
+            format='json')
+    assert response.status_code == 201
+
+
+def test_recipe_create_does_not_grow_with_ingredients(user_client, tags,
+                                                      ingredients):
+    _, small = count_queries(lambda: user_client.post(
+        '/api/recipes/', recipe_payload(tags[:1], ingredients[:1], 'Малый'),
+        format='json'))
+    _, large = count_queries(lambda: user_client.post(
+        '/api/recipes/', recipe_payload(tags, ingredients[:30], 'Большой'),
+        format='json'))
+    assert large == small
+
+
+@pytest.fixture
+def own_recipe(user, tags, ingredients):
+    recipe = Recipe.objects.create(
+        author=user, name='Свой рецепт', text='Текст.', cooking_time=5)
+    recipe.tags.set(tags)
+    return recipe
+
+
+def test_recipe_update(user_client, own_recipe, tags, ingredients,
+                       django_assert_max_num_queries):
+    with django_assert_max_num_queries(19):
+        response = user_client.patch(
+            f'/api/recipes/{own_recipe.id}/',
+            recipe_payload(tags, ingredients[:6]), format='json')
+    assert response.status_code == 200
+
+
+def test_recipe_update_does_not_grow_with_ingredients(user_client,
+                                                      own_recipe, tags,
+                                                      ingredients):
+    url = f'/api/recipes/{own_recipe.id}/'
+    _, small = count_queries(lambda: user_client.patch(
+        url, recipe_payload(tags[:1], ingredients[:1]), format='json'))
+    _, large = count_queries(lambda: user_client.patch(
+        url, recipe_payload(tags, ingredients[:30]), format='json'))
+    assert large == small
+
+
+def test_recipe_update_writes_only_changed_rows(user_client, own_recipe,
+                                                tags, ingredients):
+    url = f'/api/recipes/{own_recipe.id}/'
+    payload = recipe_payload(tags, ingredients[:6])
+    user_client.patch(url, payload, format='json')
+
+    def ingredient_writes():
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.patch(url, payload, format='json')
+        assert response.status_code == 200
+        return sorted(
+            match[1] for match in (
+                INGREDIENT_WRITE.match(query['sql'])
+                for query in context.captured_queries
+            ) if match
+        )
+
+    assert ingredient_writes() == []
+    payload['ingredients'] = payload['ingredients'][1:] + [
+        {'id': ingredients[6].id, 'amount': 3}]
+    payload['ingredients'][0]['amount'] = 42
+    assert ingredient_writes() == ['DELETE', 'INSERT', 'UPDATE']
+
+
+def test_recipe_delete(user_client, own_recipe,
+                       django_assert_max_num_queries):
+    with django_assert_max_num_queries(15):
+        response = user_client.delete(f'/api/recipes/{own_recipe.id}/')
+    assert response.status_code == 204
+
+
+@pytest.mark.parametrize('action, model', (
+    ('favorite', Favorite),
+    ('shopping_cart', ShoppingCart),
+))
+def test_recipe_user_lists(user_client, user, dataset, action, model,
+                           django_assert_max_num_queries):
+    recipe = dataset[1]
+    url = f'/api/recipes/{recipe.id}/{action}/'
+    with django_assert_max_num_queries(10):
+        response = user_client.post(url)
+    assert response.status_code == 201
+    assert model.objects.filter(user=user, recipe=recipe).exists()
+    with django_assert_max_num_queries(9):
+        response = user_client.delete(url)
+    assert response.status_code == 204
+    assert not model.objects.filter(user=user, recipe=recipe).exists()
+
+
+def test_download_shopping_cart(user_client, dataset,
+                                django_assert_max_num_queries):
+    with django_assert_max_num_queries(2):
+        response = user_client.get('/api/recipes/download_shopping_cart/')
+    assert response.status_code == 200
+
+
+def test_download_shopping_cart_does_not_grow_with_cart(
+        user_client, user, dataset, django_capture_on_commit_callbacks):
+    url = '/api/recipes/download_shopping_cart/'
+    with django_capture_on_commit_callbacks(execute=True):
+        ShoppingCart.objects.filter(user=user).delete()
+        ShoppingCart.objects.create(user=user, recipe=dataset[0])
+    _, small = count_queries(lambda: user_client.get(url))
+    with django_capture_on_commit_callbacks(execute=True):
+        for recipe in dataset[1:]:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+    _, large = count_queries(lambda: user_client.get(url))
+    assert large == small
+
+
+@pytest.mark.parametrize('client_name, budget', (
+    ('client', 2),
+    ('user_client', 3),
+))
+def test_user_list(request, dataset, client_name, budget,
+                   django_assert_max_num_queries):
+    client = request.getfixturevalue(client_name)
+    with django_assert_max_num_queries(budget):
+        response = client.get('/api/users/?limit=20')
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('client_name', ('client', 'user_client'))
+def test_user_list_does_not_grow_with_page_size(request, dataset,
+                                                client_name):
+    client = request.getfixturevalue(client_name)
+    _, single = count_queries(lambda: client.get('/api/users/?limit=1'))
+    _, full = count_queries(lambda: client.get('/api/users/?limit=100'))
+    assert full == single
+
+
+@pytest.mark.parametrize('url, budget', (
+    ('/api/users/{author}/', 3),
+    ('/api/users/me/', 2),
+))
+def test_user_detail(user_client, authors, url, budget,
+                     django_assert_max_num_queries):
+    with django_assert_max_num_queries(budget):
+        response = user_client.get(url.format(author=authors[0].id))
+    assert response.status_code == 200
+
+
+def test_subscriptions(user_client, dataset,
+                       django_assert_max_num_queries):
+    with django_assert_max_num_queries(4):
+        response = user_client.get('/api/users/subscriptions/')
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('recipes_limit', ('0', '-1', 'три'))
+def test_subscriptions_reject_bad_recipes_limit(user_client, dataset,
+                                                recipes_limit):
+    response = user_client.get(
+        f'/api/users/subscriptions/?recipes_limit={recipes_limit}')
+    assert response.status_code == 400
+
+
+def test_subscriptions_latest_recipes(user_client, authors, dataset):
+    response = user_client.get(
+        '/api/users/subscriptions/?recipes_limit=2&limit=1')
+    author = response.data['results'][0]
+    latest = sorted(
+        (recipe.id for recipe in dataset if recipe.author_id == author['id']),
+        reverse=True)
+    assert [recipe['id'] for recipe in author['recipes']] == latest[:2]
+    assert author['recipes_count'] == len(latest)
+    assert author['is_subscribed'] is True
+
+
+def test_subscriptions_do_not_grow_with_page_size(user_client, user,
+                                                  authors, dataset):
+    Follow.objects.bulk_create(
+        Follow(user=user, author=author) for author in authors[1::2])
+    url = '/api/users/subscriptions/?recipes_limit=3&limit={}'
+    _, single = count_queries(lambda: user_client.get(url.format(1)))
+    _, full = count_queries(lambda: user_client.get(url.format(len(authors))))
+    assert full == single
+
+
+def test_subscribe(user_client, user, authors, dataset,
+                   django_assert_max_num_queries):
+    author = authors[1]
+    url = f'/api/users/{author.id}/subscribe/'
+    with django_assert_max_num_queries(9):
+        response = user_client.post(url)
+    assert response.status_code == 201
+    assert Follow.objects.filter(user=user, author=author).exists()
+    with django_assert_max_num_queries(7):
+        response = user_client.delete(url)
+    assert response.status_code == 204
+    assert not Follow.objects.filter(user=user, author=author).exists()
+
+
+@pytest.mark.parametrize('url, budget', (
+    ('/api/tags/', 1),
+    ('/api/tags/{tag}/', 1),
+    ('/api/ingredients/', 1),
+    ('/api/ingredients/?name=ингр', 1),
+    ('/api/ingredients/{ingredient}/', 1),
+))
+def test_reference_data(client, tags, ingredients, url, budget,
+                        django_assert_max_num_queries):
+    url = url.format(tag=tags[0].id, ingredient=ingredients[0].id)
+    with django_assert_max_num_queries(budget):
+        response = client.get(url)
+    assert response.status_code == 200
+
+
+def test_token_login_logout(client, user, django_assert_max_num_queries):
+    with django_assert_max_num_queries(6):
+        response = client.post('/api/auth/token/login/', {
+            'email': user.email, 'password': 'foodgram-password'})
+    assert response.status_code == 200
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}')
+    # Нового токена нет в кеше: владелец читается до версии, затем
+    # пользователь целиком.
+    with django_assert_max_num_queries(4):
+        response = client.post('/api/auth/token/logout/')
+    assert response.status_code == 204
+
+
+def test_subscribe_rejects_bad_recipes_limit_before_write(user_client, user):
+    author = make_user('author')
+    response = user_client.post(
+        f'/api/users/{author.id}/subscribe/?recipes_limit=abc')
+    assert response.status_code == 400
+    assert not Follow.objects.filter(user=user, author=author).exists()
+    author.refresh_from_db()
+    assert author.followers_count == 0
@@ -0,0 +1,54 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Recipe
+
+from .test_query_budget import recipe_payload
+
+pytestmark = pytest.mark.django_db
+
+
+def test_duplicate_name_and_text_rejected(user_client, tags, ingredients):
+    payload = recipe_payload(tags, ingredients[:3])
+    assert user_client.post(
+        '/api/recipes/', payload, format='json').status_code == 201
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 400
+    assert 'non_field_errors' in response.data
+
+
+def test_update_keeps_own_name_and_text(user_client, tags, ingredients):
+    payload = recipe_payload(tags, ingredients[:3])
+    recipe_id = user_client.post(
+        '/api/recipes/', payload, format='json').data['id']
+    response = user_client.patch(
+        f'/api/recipes/{recipe_id}/', payload, format='json')
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('field, value', (
+    ('tags', lambda tags, ingredients: [tags[0].id, tags[0].id]),
+    ('ingredients', lambda tags, ingredients: [
+        {'id': ingredients[0].id, 'amount': 1},
+        {'id': ingredients[0].id, 'amount': 2},
+    ]),
+    ('ingredients', lambda tags, ingredients: [
+        {'id': ingredients[0].id, 'amount': 0},
+    ]),
+))
+def test_invalid_nested_values(user_client, tags, ingredients, field, value):
+    payload = recipe_payload(tags, ingredients[:3])
+    payload[field] = value(tags, ingredients)
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 400
+    assert field in response.data
+
+
+def test_recount_fills_missing_content_hash(user, tags):
+    Recipe.objects.bulk_create([Recipe(
+        author=user, name='Рецепт', text='Текст.', cooking_time=5)])
+    call_command('recount', stdout=StringIO())
+    assert Recipe.objects.get().content_hash == Recipe.content_digest(
+        'Рецепт', 'Текст.')
@@ -0,0 +1,38 @@
+import pytest
+
+from recipes.models import Tag
+from recipes.reference import tag_cache
+
+from .conftest import IMAGE
+
+pytestmark = pytest.mark.django_db
+
+
+def test_tags_served_from_memory(client, tags, django_assert_num_queries):
+    client.get('/api/tags/')
+    with django_assert_num_queries(0):
+        response = client.get('/api/tags/')
+        client.get(f'/api/tags/{tags[0].id}/')
+    assert [tag['slug'] for tag in response.data] == [
+        tag.slug for tag in Tag.objects.all()]
+
+
+def test_tag_save_invalidates_all_workers(tags,
+                                          django_capture_on_commit_callbacks):
+    version = tag_cache.version()
+    assert tag_cache.get(tags[0].id).name == 'Завтрак'
+    with django_capture_on_commit_callbacks(execute=True):
+        Tag.objects.filter(pk=tags[0].id).update(name='Бранч')
+        Tag.objects.get(pk=tags[0].id).save()
+    assert tag_cache.version() != version
+    assert tag_cache.get(tags[0].id).name == 'Бранч'
+
+
+def test_unknown_reference_ids_rejected(user_client, tags, ingredients):
+    response = user_client.post('/api/recipes/', {
+        'name': 'Рецепт', 'text': 'Текст.', 'image': IMAGE,
+        'cooking_time': 5, 'tags': [tags[0].id, 999],
+        'ingredients': [{'id': 'соль', 'amount': 1}],
+    }, format='json')
+    assert response.status_code == 400
+    assert set(response.data) == {'tags', 'ingredients'}
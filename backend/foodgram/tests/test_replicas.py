@@ -0,0 +1,132 @@
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.db import OperationalError, connections
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+
+from api import replicas
+from api.authentication import token_users
+from recipes.memberships import reset_memberships
+from recipes.models import Favorite
+from recipes.reference import tag_cache
+
+# Реплика — зеркало основной базы, поэтому данные фиксируются.
+pytestmark = pytest.mark.django_db(
+    transaction=True, databases=['default', 'replica'])
+
+
+@pytest.fixture(autouse=True)
+def replica(settings):
+    settings.REPLICA_DATABASES = ['replica']
+    replicas.health.clear()
+    yield
+    replicas.health.clear()
+
+
+def queries(client, url, method='get'):
+    """Число запросов ответа к основной базе и к реплике."""
+    with CaptureQueriesContext(connections['default']) as primary, \
+            CaptureQueriesContext(connections['replica']) as replica:
+        response = getattr(client, method)(url)
+    assert response.status_code < 400, response.data
+    return len(primary), len(replica)
+
+
+def warm_queries(client, url):
+    """Запросы ответа, когда кеши уже заполнены первым обращением."""
+    queries(client, url)
+    return queries(client, url)
+
+
+def test_reads_go_to_replica(client, user_client, dataset, user):
+    # Закрепление после записей фикстуры уже истекло.
+    cache.delete(replicas.pin_key(user.id))
+    for url in ('/api/users/', f'/api/users/{user.id}/',
+                f'/api/recipes/{dataset[0].id}/'):
+        for reader in (client, user_client):
+            primary, replica = warm_queries(reader, url)
+            assert primary == 0 and replica > 0, url
+
+
+def test_other_requests_use_primary(user_client, dataset):
+    assert queries(user_client, '/api/users/me/') == (1, 0)
+    primary, replica = queries(
+        user_client, f'/api/recipes/{dataset[1].id}/favorite/', 'post')
+    assert primary > 0 and replica == 0
+
+
+def test_user_reads_own_writes(client, user_client, user, dataset):
+    recipe = dataset[1]
+    url = f'/api/recipes/{recipe.id}/'
+    Favorite.objects.filter(user=user, recipe=recipe).delete()
+    assert cache.get(replicas.pin_key(user.id))
+    cache.delete(replicas.pin_key(user.id))
+    assert warm_queries(user_client, url)[0] == 0
+    user_client.post(f'/api/recipes/{recipe.id}/favorite/')
+    primary, replica = queries(user_client, url)
+    assert primary > 0 and replica == 0
+    # Остальные пользователи по-прежнему читают из реплики.
+    assert warm_queries(client, url)[0] == 0
+    cache.delete(replicas.pin_key(user.id))
+    assert warm_queries(user_client, url)[0] == 0
+
+
+def test_unknown_token_reads_primary(user_client, user, dataset):
+    # Токен только что выдан: его нет ни в одном кеше.
+    cache.clear()
+    token_users.clear()
+    primary, replica = queries(user_client, '/api/tags/')
+    assert primary > 0 and replica == 0
+
+
+def test_unhealthy_replica_falls_back(monkeypatch, client, dataset):
+    def fail(*args, **kwargs):
+        raise OperationalError('replica is down')
+
+    monkeypatch.setattr(connections['replica'], 'cursor', fail)
+    primary, replica = queries(client, '/api/users/?limit=6')
+    assert primary > 0
+    assert replicas.health['replica'][1] is False
+    monkeypatch.undo()
+    # Проверка повторяется не раньше REPLICA_HEALTH_INTERVAL.
+    assert queries(client, '/api/users/?limit=5')[0] > 0
+    replicas.health.clear()
+    assert queries(client, '/api/users/?limit=4')[0] == 0
+
+
+@pytest.mark.django_db(
+    transaction=True, databases=['default', 'replica', 'lagging'])
+def test_caches_filled_from_primary(settings, client, user_client, user,
+                                    dataset, tags):
+    # Отставшая реплика: схема есть, данных ещё нет.
+    settings.REPLICA_DATABASES = ['lagging']
+    cache.delete(replicas.pin_key(user.id))
+    tag_cache.invalidate()
+    reset_memberships()
+    assert client.get('/api/users/').data['results'] == []
+    assert len(client.get('/api/tags/').data) == len(tags)
+    assert len(client.get('/api/recipes/?limit=6').data['results']) == 6
+    results = user_client.get('/api/recipes/?limit=100').data['results']
+    favorited = {recipe['id'] for recipe in results if recipe['is_favorited']}
+    assert favorited == {recipe.id for recipe in dataset[::2]}
+
+
+def test_middleware_stays_async_under_asgi(monkeypatch, user):
+    async def get_response(request):
+        return None
+
+    def sync_path(request):
+        raise AssertionError('синхронный выбор базы под ASGI')
+
+    middleware = replicas.ReplicaMiddleware(get_response)
+    assert iscoroutinefunction(middleware)
+    assert iscoroutinefunction(middleware.process_view)
+    monkeypatch.setattr(replicas, 'reads_replica', sync_path)
+
+    async def fetch():
+        return await AsyncClient().get(f'/api/users/{user.id}/')
+
+    response = async_to_sync(fetch)()
+    assert response.status_code == 200
+    assert replicas.health['replica'][1] is True
@@ -0,0 +1,27 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from users.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+
+def test_seed_small_dataset(tmp_path):
+    catalog = tmp_path / 'ingredients.csv'
+    catalog.write_text(
+        ''.join(f'ингредиент {number},г\n' for number in range(5)),
+        encoding='utf-8')
+    call_command(
+        'seed_load_data', catalog=str(catalog), users=4, recipes=6,
+        ingredients_per_recipe=3, favorites=5, carts=5, follows=5,
+        batch_size=4, stdout=StringIO(),
+    )
+    assert CustomUser.objects.count() == 4
+    assert Recipe.objects.count() == 6
+    assert RecipeIngredient.objects.count() == 18
+    assert Recipe.tags.through.objects.exists()
+    assert 0 < Favorite.objects.count() <= 5
+    assert 0 < ShoppingCart.objects.count() <= 5
@@ -0,0 +1,109 @@
+import csv
+import io
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+from django.db.models import F
+
+from recipes import shopping_list
+from recipes.models import RecipeIngredient, ShoppingCart
+
+pytestmark = pytest.mark.django_db
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+def download(client, file_format):
+    response = client.get(URL, {'format': file_format})
+    assert response.status_code == 200
+    return b''.join(response.streaming_content)
+
+
+def test_formats(user_client, user, dataset):
+    totals = shopping_list.cart_totals(user)
+    assert totals
+    text = download(user_client, 'txt').decode()
+    assert text.splitlines()[1:] == shopping_list.text_lines(totals)
+    rows = list(csv.reader(io.StringIO(
+        download(user_client, 'csv').decode('utf-8-sig'))))
+    assert rows[1:] == [[str(value) for value in row] for row in totals]
+    assert download(user_client, 'pdf').startswith(b'%PDF')
+
+
+def test_unknown_format(user_client, dataset):
+    response = user_client.get(URL, {'format': 'docx'})
+    assert response.status_code == 400
+    assert 'format' in response.data
+
+
+def test_unchanged_cart_served_from_cache(user_client, dataset,
+                                          django_assert_num_queries):
+    first = download(user_client, 'csv')
+    # Токен берётся из кеша, запросов к базе нет.
+    with django_assert_num_queries(0):
+        assert download(user_client, 'csv') == first
+
+
+def test_cart_change_invalidates_export(user_client, user, dataset,
+                                        django_capture_on_commit_callbacks):
+    first = download(user_client, 'txt')
+    with django_capture_on_commit_callbacks(execute=True):
+        ShoppingCart.objects.filter(user=user).first().delete()
+    assert download(user_client, 'txt') != first
+
+
+def test_pdf_rejected_when_all_slots_busy(user_client, dataset, settings):
+    settings.SHOPPING_LIST_PDF_WORKERS = 1
+    slot = shopping_list.acquire_pdf_slot()
+    response = user_client.get(URL, {'format': 'pdf'})
+    assert response.status_code == 503
+    assert response['Retry-After']
+    cache.delete(slot)
+    assert download(user_client, 'pdf').startswith(b'%PDF')
+
+
+def test_slow_pdf_keeps_slot_until_done(monkeypatch, user_client, dataset,
+                                        settings):
+    settings.SHOPPING_LIST_PDF_WORKERS = 1
+    release, done = threading.Event(), threading.Event()
+
+    def slow_render(rows):
+        release.wait(5)
+        done.set()
+        return b'%PDF'
+
+    monkeypatch.setattr(shopping_list, 'render_pdf', slow_render)
+    monkeypatch.setattr(shopping_list, 'PDF_TIMEOUT', 0.05)
+    response = user_client.get(URL, {'format': 'pdf'})
+    assert response.status_code == 503
+    assert response['Retry-After']
+    # Отрисовка ещё идёт, и слот остаётся занятым.
+    assert user_client.get(URL, {'format': 'pdf'}).status_code == 503
+    release.set()
+    assert done.wait(5)
+    deadline = time.monotonic() + 5
+    while cache.get('shopping-list:pdf-slot:0') and (
+            time.monotonic() < deadline):
+        time.sleep(0.01)
+    assert cache.get('shopping-list:pdf-slot:0') is None
+
+
+def test_export_follows_only_recipes_in_cart(
+        user_client, user, dataset, django_assert_num_queries,
+        django_capture_on_commit_callbacks):
+    first = download(user_client, 'txt')
+    other = dataset[1]
+    assert not ShoppingCart.objects.filter(user=user, recipe=other).exists()
+    with django_capture_on_commit_callbacks(execute=True):
+        other.name = 'Другое название'
+        other.save()
+    with django_assert_num_queries(0):
+        assert download(user_client, 'txt') == first
+    in_cart = ShoppingCart.objects.filter(user=user).first().recipe
+    with django_capture_on_commit_callbacks(execute=True):
+        with shopping_list.recipe_ingredients_change(in_cart.id):
+            RecipeIngredient.objects.filter(recipe=in_cart).update(
+                amount=F('amount') + 1)
+    assert download(user_client, 'txt') != first
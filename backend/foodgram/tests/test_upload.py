@@ -0,0 +1,69 @@
+import base64
+import json
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from recipes.models import Recipe
+
+from .conftest import IMAGE
+from .test_query_budget import recipe_payload
+
+pytestmark = pytest.mark.django_db
+
+
+def image_file():
+    return SimpleUploadedFile(
+        'photo.png', base64.b64decode(IMAGE.split(',')[1]),
+        content_type='image/png')
+
+
+def multipart(payload, **files):
+    payload = dict(payload)
+    payload.pop('image', None)
+    return {'data': json.dumps(payload), **files}
+
+
+def test_multipart_create(user_client, tags, ingredients):
+    response = user_client.post(
+        '/api/recipes/',
+        multipart(recipe_payload(tags, ingredients[:3]), image=image_file()),
+        format='multipart')
+    assert response.status_code == 201
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    assert recipe.image.name.endswith('.png')
+    assert recipe.recipe_ingredient.count() == 3
+
+
+def test_create_requires_image(user_client, tags, ingredients):
+    payload = recipe_payload(tags, ingredients[:3])
+    del payload['image']
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 400
+    assert 'image' in response.data
+
+
+@pytest.mark.parametrize('data_format', ('json', 'multipart'))
+def test_update_without_image_keeps_file(user_client, tags, ingredients,
+                                         data_format):
+    payload = recipe_payload(tags, ingredients[:3])
+    recipe_id = user_client.post(
+        '/api/recipes/', payload, format='json').data['id']
+    image = Recipe.objects.get(pk=recipe_id).image.name
+    payload['name'] = 'Новое название'
+    del payload['image']
+    if data_format == 'multipart':
+        payload = multipart(payload)
+    response = user_client.patch(
+        f'/api/recipes/{recipe_id}/', payload, format=data_format)
+    assert response.status_code == 200
+    recipe = Recipe.objects.get(pk=recipe_id)
+    assert recipe.name == 'Новое название'
+    assert recipe.image.name == image
+
+
+def test_multipart_rejects_invalid_json(user_client, tags, ingredients):
+    response = user_client.post(
+        '/api/recipes/', {'data': '{', 'image': image_file()},
+        format='multipart')
+    assert response.status_code == 400
@@ -0,0 +1,29 @@
+import pytest
+
+from users.models import Follow
+
+pytestmark = pytest.mark.django_db
+
+
+def test_is_subscribed_in_user_list(user_client, user, authors, dataset):
+    subscribed = set(Follow.objects.filter(
+        user=user).values_list('author_id', flat=True))
+    results = user_client.get('/api/users/?limit=100').data['results']
+    assert subscribed
+    assert {
+        row['id'] for row in results if row['is_subscribed']
+    } == subscribed
+
+
+def test_is_subscribed_in_recipe_detail(user_client, user, dataset):
+    recipe = next(
+        recipe for recipe in dataset
+        if Follow.objects.filter(user=user, author=recipe.author).exists())
+    response = user_client.get(f'/api/recipes/{recipe.id}/')
+    assert response.data['author']['is_subscribed'] is True
+
+
+def test_me(user_client, user):
+    response = user_client.get('/api/users/me/')
+    assert response.status_code == 200
+    assert response.data['is_subscribed'] is False
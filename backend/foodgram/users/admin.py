@@ -12,6 +12,8 @@ class CustomUserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'is_superuser',
+        'recipes_count',
+        'followers_count',
     )
     list_filter = ('username', 'email', 'is_superuser')
     search_fields = (
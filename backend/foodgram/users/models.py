@@ -66,6 +66,17 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         'Администратор',
         default=False,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        editable=False,
+    )
+    updated_at = models.DateTimeField('Изменён', auto_now=True)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = [